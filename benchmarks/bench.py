@@ -0,0 +1,216 @@
+# Performance benchmarks of objective functions and heuristics:
+#
+#   python benchmarks/bench.py                            # run and print results
+#   python benchmarks/bench.py --save baseline.json       # store results as a baseline
+#   python benchmarks/bench.py --compare baseline.json    # flag regressions against a baseline (exit code 1)
+#
+# Every benchmark reports evaluations per second, heuristic overhead per evaluation (time of search() not
+# spent in the objective function) and peak memory (measured in a separate run under tracemalloc).
+# Evaluations per second come from plain runs, the time spent in the objective function from separate runs
+# through a timing proxy (corrected for the cost of its own timing calls).
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from objfun import AirShip, Zebra3, TSPGrid  # noqa: E402
+from heur import ShootAndGo, FSA, GO  # noqa: E402
+from steplog import StepLog  # noqa: E402
+
+
+class TimedObjFun:
+
+    # objective function proxy measuring time spent in evaluation methods, their timing wrappers are bound
+    # once as attributes of the proxy, other attributes are looked up in the objective function
+
+    timed = ('evaluate', 'evaluate_batch', 'evaluate_move')
+
+    def __init__(self, of):
+        self.of = of
+        self.time = 0.0
+        self.calls = 0
+        for name in self.timed:
+            if hasattr(of, name):
+                setattr(self, name, self.wrap(getattr(of, name)))
+
+    def wrap(self, method):
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return method(*args)
+            finally:
+                self.time += time.perf_counter()-start
+                self.calls += 1
+        return timed
+
+    def __getattr__(self, name):
+        return getattr(self.of, name)
+
+
+def wrapper_cost(repeat=5, number=10000):
+    # time per call the timing wrapper adds to TimedObjFun.time (measured on an empty method)
+    costs = []
+    for _ in range(repeat):
+        proxy = TimedObjFun(None)
+        empty = proxy.wrap(lambda *args: None)
+        for i in range(number):
+            empty(i)
+        costs.append(proxy.time/number)
+    return min(costs)
+
+
+def objective_functions(quick):
+    sizes = {
+        'AirShip': [None],
+        'Zebra3': [10, 100] if quick else [10, 100, 1000],
+        'TSPGrid': [(5, 5)] if quick else [(5, 5), (10, 10), (20, 20)],
+    }
+    for _ in sizes['AirShip']:
+        yield 'AirShip', lambda: AirShip(-100, 0, 800, rng=0)
+    for d in sizes['Zebra3']:
+        yield 'Zebra3(%d)' % d, lambda d=d: Zebra3(d, rng=0)
+    for a, b in sizes['TSPGrid']:
+        yield 'TSPGrid(%d,%d)' % (a, b), lambda a=a, b=b: TSPGrid(a, b, rng=0)
+
+
+def heuristics(maxeval):
+    yield 'ShootAndGo(hmax=10)', lambda of: ShootAndGo(of, maxeval, hmax=10)
+    yield 'ShootAndGo(hmax=inf)', lambda of: ShootAndGo(of, maxeval, hmax=np.inf)
+    yield 'FSA', lambda of: FSA(of, maxeval, T0=1, n0=100, alpha=2, r=0.5, step_log=StepLog())
+    yield 'GO', lambda of: GO(of, maxeval, n=50, m=100, t_sel1=10, t_sel2=10, r=0.5, co_m=2)
+
+
+def measure(run, min_time):
+    # repeats run() until min_time elapses, returns (seconds per run, evaluations per run, extra data)
+    count = 0
+    total = 0.0
+    neval = 0
+    extra = {}
+    while total < min_time:
+        start = time.perf_counter()
+        n, extra = run()
+        total += time.perf_counter()-start
+        neval += n
+        count += 1
+    return total/count, neval/count, extra
+
+
+def peak_memory(run):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_objfun(make_of, min_time):
+    results = {}
+    of = make_of()
+    x = of.generate_point()
+
+    def run_evaluate():
+        for i in range(100):
+            of.evaluate(x)
+        return 100, {}
+
+    def run_neighborhood():
+        n = len(list(of.get_neighborhood(x, 1)))
+        return n, {}
+
+    for name, run in [('evaluate', run_evaluate), ('get_neighborhood', run_neighborhood)]:
+        t, n, _ = measure(run, min_time)
+        results[name] = {'evals_per_sec': n/t, 'peak_memory': peak_memory(run)}
+    return results
+
+
+def bench_heuristic(make_heur, make_of, min_time, cost):
+    # cost is the time per call the timing proxy attributes to the objective function (see wrapper_cost)
+    def run_plain():
+        heur = make_heur(make_of())
+        heur.search()
+        return heur.neval, {}
+
+    of_times = []
+
+    def run_timed():
+        of = TimedObjFun(make_of())
+        heur = make_heur(of)
+        heur.search()
+        of_times.append(max(0.0, of.time-of.calls*cost))
+        return heur.neval, {}
+
+    t, n, _ = measure(run_plain, min_time)
+    measure(run_timed, min_time)
+    of_time = np.mean(of_times)  # runs are deterministic, the same evaluations as in the plain runs
+    return {
+        'evals_per_sec': n/t,
+        'overhead_per_eval': (t-of_time)/n if n > 0 else np.nan,
+        'peak_memory': peak_memory(run_plain),
+    }
+
+
+def run_benchmarks(quick=False, min_time=0.2, maxeval=2000):
+    results = {}
+    cost = wrapper_cost()
+    for of_name, make_of in objective_functions(quick):
+        for name, res in bench_objfun(make_of, min_time).items():
+            results['%s.%s' % (of_name, name)] = res
+        for heur_name, make_heur in heuristics(maxeval):
+            results['%s.%s' % (of_name, heur_name)] = bench_heuristic(make_heur, make_of, min_time, cost)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # regressions: evaluations per second dropped or peak memory grew by more than tolerance (relative)
+    regressions = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if res['evals_per_sec'] < base['evals_per_sec']*(1-tolerance):
+            regressions.append('%s: %.0f evals/s (baseline %.0f)' % (key, res['evals_per_sec'], base['evals_per_sec']))
+        if res['peak_memory'] > base['peak_memory']*(1+tolerance):
+            regressions.append('%s: peak memory %d B (baseline %d B)' % (key, res['peak_memory'], base['peak_memory']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of objective functions and heuristics.')
+    parser.add_argument('--quick', action='store_true', help='smaller problem sizes only')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimal time per benchmark [s]')
+    parser.add_argument('--maxeval', type=int, default=2000, help='maxeval of heuristic runs')
+    parser.add_argument('--save', metavar='FILE', help='store results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare results against a JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative tolerance of regressions')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick, args.min_time, args.maxeval)
+    print('%-40s %15s %18s %14s' % ('benchmark', 'evals/s', 'overhead/eval [us]', 'peak mem [kB]'))
+    for key, res in results.items():
+        overhead = res.get('overhead_per_eval')
+        print('%-40s %15.0f %18s %14.1f' % (key, res['evals_per_sec'],
+                                             '' if overhead is None else '%.2f' % (overhead*1e6),
+                                             res['peak_memory']/1024))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -88,7 +88,7 @@ z3.evaluate(x)
 
 # In[7]:
 
-z3.get_neighborhood(x, 1)
+list(z3.get_neighborhood(x, 1))
 
 
 # In[8]:
@@ -75,7 +75,7 @@ tsp.evaluate(x)
 
 # In[8]:
 
-tsp.get_neighborhood(x, 1)
+list(tsp.get_neighborhood(x, 1))
 
 
 # In[9]:
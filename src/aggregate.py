@@ -0,0 +1,122 @@
+import numpy as np
+from statistics import NormalDist
+
+
+# Streaming aggregation of neval of experiment replicates (see experiment.run_experiment), the statistics
+# of the notebooks are updated row by row, without keeping the rows:
+#
+#   rel -- reliability, fraction of successful runs (neval < inf)
+#   mne -- mean number of evaluations of successful runs
+#   feo -- feoktistov criterion, mne/rel
+#
+#   agg = Aggregator(['T0'])
+#   run_experiment(FSA, of_factory, param_grid, M=10**5, aggregator=agg)
+#   tab = pd.DataFrame(agg.summary())  # one row per T0 with rel, mne, feo and their confidence intervals
+#
+# Partial aggregates (e.g. of different processes or machines) are combined by merge().
+
+
+class NevalStats:
+
+    # running statistics of neval of a single configuration (Welford updates of mean and variance)
+
+    def __init__(self):
+        self.n = 0  # number of runs
+        self.k = 0  # number of successful runs
+        self.mean = 0.0  # mean neval of successful runs
+        self.m2 = 0.0  # sum of squared deviations from mean of successful runs
+
+    def add(self, neval):
+        self.n += 1
+        if neval < np.inf:
+            self.k += 1
+            delta = neval-self.mean
+            self.mean += delta/self.k
+            self.m2 += delta*(neval-self.mean)
+
+    def add_batch(self, nevals):
+        part = NevalStats()
+        nevals = np.asarray(nevals, dtype=float)
+        success = nevals[nevals < np.inf]
+        part.n = np.size(nevals)
+        part.k = np.size(success)
+        if part.k > 0:
+            part.mean = np.mean(success)
+            part.m2 = np.sum((success-part.mean)**2)
+        self.merge(part)
+
+    def merge(self, other):
+        # combines partial statistics (Chan et al. update)
+        k = self.k+other.k
+        if k > 0:
+            delta = other.mean-self.mean
+            self.m2 += other.m2+delta**2*self.k*other.k/k
+            self.mean += delta*other.k/k
+        self.n += other.n
+        self.k = k
+
+    def rel(self):
+        return np.nan if self.n == 0 else self.k/self.n
+
+    def mne(self):
+        return np.nan if self.k == 0 else self.mean
+
+    def feo(self):
+        return np.nan if self.k == 0 else self.mne()/self.rel()
+
+    def rel_ci(self, z):
+        # Wilson score interval
+        if self.n == 0:
+            return np.nan, np.nan
+        p = self.rel()
+        center = (p+z**2/(2*self.n))/(1+z**2/self.n)
+        half = z*np.sqrt(p*(1-p)/self.n+z**2/(4*self.n**2))/(1+z**2/self.n)
+        return center-half, center+half
+
+    def mne_var(self):
+        # variance of the mne estimate
+        return np.nan if self.k < 2 else self.m2/(self.k-1)/self.k
+
+    def mne_ci(self, z):
+        # normal approximation
+        half = z*np.sqrt(self.mne_var())
+        return self.mne()-half, self.mne()+half
+
+    def feo_ci(self, z):
+        # delta method for mne/rel, the estimates of mne and rel are taken as independent
+        rel = self.rel()
+        rel_var = rel*(1-rel)/self.n if self.n > 0 else np.nan
+        var = self.mne_var()/rel**2+self.mne()**2*rel_var/rel**4 if self.k > 0 else np.nan
+        half = z*np.sqrt(var)
+        return self.feo()-half, self.feo()+half
+
+    def summary(self, confidence=0.95):
+        z = NormalDist().inv_cdf((1+confidence)/2)
+        res = {'runs': self.n, 'rel': self.rel(), 'mne': self.mne(), 'feo': self.feo()}
+        for name, ci in [('rel', self.rel_ci), ('mne', self.mne_ci), ('feo', self.feo_ci)]:
+            res[name+'_lo'], res[name+'_hi'] = ci(z)
+        return res
+
+
+class Aggregator:
+
+    # NevalStats per configuration, configurations are identified by values of the keys parameters
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.stats = {}
+
+    def get(self, config):
+        return self.stats.setdefault(tuple(config[key] for key in self.keys), NevalStats())
+
+    def add(self, row):
+        self.get(row).add(row['neval'])
+
+    def merge(self, other):
+        for config, stats in other.stats.items():
+            self.stats.setdefault(config, NevalStats()).merge(stats)
+
+    def summary(self, confidence=0.95):
+        # one row per configuration (sorted by the keys)
+        return [dict(zip(self.keys, config), **self.stats[config].summary(confidence))
+                for config in sorted(self.stats)]
@@ -86,14 +86,92 @@ class AirShip:
             raise
 
 
-if __name__ == "__main__":
+def local_search_trace(ship, x, iter_troops_max=10):
+    # points evaluated by one iteration of find_peak() starting by a shot to x (the local search is
+    # deterministic, so the trace depends on x only)
+    x_max = ship.x[-1]
+    xs = [x]
+    y = ship.y[x]
+    go = True
+    iter_troops_used = 0
+    while go and iter_troops_used < iter_troops_max:
+        y_l = -np.inf
+        y_r = -np.inf
+        if x >= 1:
+            xs.append(x-1)
+            y_l = ship.y[x-1]
+            iter_troops_used += 1
+        if x <= x_max-1 and iter_troops_used < iter_troops_max:
+            xs.append(x+1)
+            y_r = ship.y[x+1]
+            iter_troops_used += 1
+        if np.maximum(y_l, y_r) > y:
+            go = True
+            x = x-1 if y_l > y_r else x+1
+            y = np.maximum(y_l, y_r)
+        else:
+            go = False
+    return xs
+
+
+def find_peaks(runs, rng=None):
+    # Runs AirShip().find_peak() for all runs at once, as arrays over the shared terrain. A run is a sequence
+    # of random shots each followed by a deterministic local search, so the traces of all shots are tabulated
+    # first and every iteration below processes one shot (with its local search) in all unfinished runs.
+    # Returns the same table as a DataFrame of find_peak() results would be (statistically, random numbers
+    # are drawn in a different order).
+    rng = np.random.default_rng(rng)
+    ship = AirShip()
+
+    # traces of all shots, padded by the last point (it does not change the best point found)
+    traces = [local_search_trace(ship, x) for x in ship.x]
+    trace_len = np.array([len(xs) for xs in traces])
+    trace_x = np.array([xs+xs[-1:]*(np.max(trace_len)-len(xs)) for xs in traces])
+    trace_y = ship.y[trace_x]
+    # best point among the first j+1 evaluations of the trace (the first one of the highest ones)
+    best_y = np.maximum.accumulate(trace_y, axis=1)
+    steps = np.arange(trace_y.shape[1])
+    best_j = np.maximum.accumulate(np.where(trace_y > np.concatenate(
+        (np.full((len(traces), 1), -np.inf), best_y[:, :-1]), axis=1), steps, 0), axis=1)
+    best_x = np.take_along_axis(trace_x, best_j, axis=1)
+    # number of evaluations until the top peak is found (inf if it is not in the trace)
+    is_top = trace_y == ship.top_peak_y
+    top_len = np.where(np.any(is_top, axis=1), np.argmax(is_top, axis=1)+1, np.inf)
+
+    troops_used = np.zeros(runs, dtype=int)
+    best_peak_x = np.zeros(runs, dtype=int)
+    best_peak_y = np.full(runs, -np.inf)
+    top_found = np.zeros(runs, dtype=bool)
+    done = np.zeros(runs, dtype=bool)
 
-    res = []
-    for i in range(1000):
-        ship = AirShip()
-        res.append(ship.find_peak())
+    while not np.all(done):
+        i = np.nonzero(~done)[0]
+        x = rng.integers(0, ship.x[-1]+1, np.size(i))  # random shots
+        used = np.minimum(trace_len[x], ship.troops_max-troops_used[i])  # evaluations until troops run out
+        top = top_len[x] <= used
+        used = np.where(top, top_len[x], used).astype(int)  # the search ends at the top peak
+
+        y = best_y[x, used-1]
+        better = y > best_peak_y[i]
+        best_peak_x[i[better]] = best_x[x, used-1][better]
+        best_peak_y[i[better]] = y[better]
+        troops_used[i] += used
+
+        top_found[i[top]] = True
+        done[i[top]] = True
+        done[troops_used >= ship.troops_max] = True
+
+    return pd.DataFrame({
+        'best_peak_y': best_peak_y,
+        'best_peak_x': best_peak_x,
+        'troops_used': troops_used,
+        'exit_reason': np.where(top_found, 'top_peak_found', 'all_troops_used')
+    })
+
+
+if __name__ == "__main__":
 
-    tab = pd.DataFrame(res)
+    tab = find_peaks(1000)
     print('Highest peak found: ' + str(tab['best_peak_y'].sort_values(ascending=False).iloc[0]))
     top_rows = tab['best_peak_y'] == 100
     print('No. of times when top peak found: ' + str(sum(top_rows)))
@@ -0,0 +1,30 @@
+import os
+import pickle
+
+
+# Checkpoints of heuristics: the whole heuristic (search state, best point, neval, step log, random generator
+# and its pre-drawn uniform numbers, objective function) is pickled, so a resumed search continues exactly as
+# the interrupted one would have.
+#
+#   heur = FSA(of, maxeval, ..., step_log=DiskLog('fsa.log'), checkpoint_path='fsa.ckpt', checkpoint_every=10**6)
+#   heur.search()                           # saves a checkpoint every 10**6 evaluations
+#   heur = load_checkpoint('fsa.ckpt')      # e.g. after a restart
+#   heur.search()                           # goes on from the checkpoint
+#
+# In-memory step logs growing with the search (FullLog, EveryKLog) are refused, as every checkpoint would
+# store them whole. A DiskLog is resumed consistently: rows flushed after the checkpoint are dropped from
+# the store (see colstore.ColumnWriter.truncate) and logged again by the resumed search.
+# Observers are not stored, they have to be added again after loading.
+
+
+def save_checkpoint(heur, path):
+    # the checkpoint is replaced atomically, an interrupted save leaves the previous one intact
+    tmp_path = path+'.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(heur, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,125 @@
+import numpy as np
+import json
+import os
+
+
+# Append-only columnar store: a directory with one raw binary file per column and a small JSON header
+# (number of rows, dtype and row shape of every column). Rows are appended in chunks and the columns are
+# read back memory-mapped, so stored data never has to fit in memory.
+#
+#   writer = ColumnWriter('run.cols')
+#   writer.append({'f': np.array([1.0, 2.0]), 'x': np.array([[0, 1], [1, 1]])})
+#   cols = read_columns('run.cols')  # {'f': memmap of shape (2,), 'x': memmap of shape (2, 2)}
+
+META_FILE = 'meta.json'
+
+
+def fill_value(dtype):
+    # value of rows missing in a column
+    return np.nan if np.issubdtype(dtype, np.floating) else np.zeros(1, dtype=dtype)[0]
+
+
+class ColumnWriter:
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):  # continue appending to an existing store
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {'nrows': 0, 'columns': {}}
+
+    def column_path(self, name):
+        return os.path.join(self.path, name+'.bin')
+
+    def append(self, columns):
+        # columns maps names to arrays with one row per element of the first axis (equal for all columns),
+        # columns not present in the chunk are filled with NaN (zeros for non-float columns); a stored column
+        # is widened if the chunk does not fit its dtype (e.g. floats appended to an int column)
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        k = len(next(iter(columns.values()))) if columns else 0
+        if k == 0:
+            return
+        nrows = self.meta['nrows']
+        for name, values in columns.items():
+            assert len(values) == k, 'All columns of a chunk must have the same number of rows'
+            if name not in self.meta['columns']:
+                self.meta['columns'][name] = {'dtype': values.dtype.str, 'shape': list(values.shape[1:])}
+                self.truncate(name)
+                if nrows > 0:  # column appeared later, fill preceding rows
+                    self.write(name, np.full((nrows,)+values.shape[1:], fill_value(values.dtype), dtype=values.dtype))
+            else:
+                spec = self.meta['columns'][name]
+                if list(values.shape[1:]) != spec['shape']:
+                    raise ValueError('Rows of column %s have shape %s, stored rows have shape %s'
+                                     % (name, values.shape[1:], tuple(spec['shape'])))
+                if not np.can_cast(values.dtype, np.dtype(spec['dtype'])):
+                    self.widen(name, np.promote_types(np.dtype(spec['dtype']), values.dtype))
+        for name, spec in self.meta['columns'].items():
+            dtype = np.dtype(spec['dtype'])
+            self.truncate(name)
+            if name in columns:
+                values = columns[name].astype(dtype, copy=False)
+            else:
+                values = np.full([k]+spec['shape'], fill_value(dtype), dtype=dtype)
+            self.write(name, values)
+        self.meta['nrows'] = nrows+k
+        self.write_meta()
+
+    def truncate(self, name):
+        # drops bytes beyond the rows counted in the header, i.e. rows written after the header was read
+        # (e.g. by a writer restored from a checkpoint) or left by an interrupted append
+        spec = self.meta['columns'][name]
+        size = self.meta['nrows']*np.dtype(spec['dtype']).itemsize*int(np.prod(spec['shape']))
+        path = self.column_path(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def widen(self, name, dtype):
+        # rewrites the stored rows of the column with the dtype
+        spec = self.meta['columns'][name]
+        shape = [self.meta['nrows']]+spec['shape']
+        values = np.fromfile(self.column_path(name), dtype=np.dtype(spec['dtype']), count=int(np.prod(shape)))
+        tmp_path = self.column_path(name)+'.tmp'
+        values.astype(dtype).tofile(tmp_path)
+        os.replace(tmp_path, self.column_path(name))
+        spec['dtype'] = dtype.str
+        self.write_meta()
+
+    def write(self, name, values):
+        with open(self.column_path(name), 'ab') as f:
+            f.write(np.ascontiguousarray(values).tobytes())
+
+    def write_meta(self):
+        # the header is replaced atomically, rows beyond its row count are ignored by readers
+        tmp_path = os.path.join(self.path, META_FILE+'.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def read_columns(path, names=None, mmap_mode='r'):
+    # returns a dict of (memory-mapped) columns, mmap_mode=None loads them into memory
+    meta = read_meta(path)
+    nrows = meta['nrows']
+    columns = {}
+    for name, spec in meta['columns'].items():
+        if names is not None and name not in names:
+            continue
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple([nrows]+spec['shape'])
+        file_path = os.path.join(path, name+'.bin')
+        if nrows == 0 or dtype.itemsize*int(np.prod(shape)) == 0:
+            columns[name] = np.zeros(shape, dtype=dtype)
+        elif mmap_mode is None:
+            columns[name] = np.fromfile(file_path, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        else:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode=mmap_mode, shape=shape)
+    return columns
@@ -0,0 +1,83 @@
+import numpy as np
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Experiment runner: M independent replicates of heur_class for every configuration of a parameter grid,
+# e.g. (the objective function factory and the heuristic class must be picklable, i.e. no lambdas,
+# and the factory has to accept the random generator as the rng keyword argument):
+#
+#   rows = run_experiment(FSA, functools.partial(AirShip, -100, 0, 800),
+#                         {'maxeval': [1000], 'T0': [0.1, 1, 10], 'n0': [100], 'alpha': [2], 'r': [0.5]}, M=1000)
+#   tab = pd.DataFrame(rows)
+#
+# Large sweeps can stream the rows into a results.ResultStore on disk and/or into an aggregate.Aggregator
+# (running rel, mne and feo per configuration) instead of keeping them in memory.
+#
+# Every replicate has its own random stream derived from (seed, configuration index, replicate index),
+# so the results do not depend on the number of workers nor on the order in which replicates finish.
+#
+# heur_class.search() has to return a single report_end() dict (e.g. not heur.MultiFSA, which runs K chains
+# and returns K reports).
+
+
+def param_configs(param_grid):
+    # all combinations of parameter values, param_grid maps parameter names to lists of values
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[param_grid[name] for name in names])]
+
+
+def replicate_seed(seed, config_ix, replicate):
+    return np.random.SeedSequence(entropy=seed, spawn_key=(config_ix, replicate))
+
+
+def run_replicate(task):
+    heur_class, of_factory, params, seed, config_ix, replicate, keep_step_data = task
+    rng = np.random.default_rng(replicate_seed(seed, config_ix, replicate))
+    heur = heur_class(of_factory(rng=rng), **params)  # the heuristic shares the generator of the objective function
+    row = heur.search()
+    assert isinstance(row, dict), '%s.search() does not return a single report' % heur_class.__name__
+    if not keep_step_data:
+        row.pop('step_data', None)
+    row.update(params)
+    row['replicate'] = replicate
+    return row
+
+
+def run_experiment(heur_class, of_factory, param_grid, M, seed=0, workers=None, keep_step_data=False, store=None,
+                   aggregator=None):
+    # returns one row (report_end() dict extended by the parameters) per replicate,
+    # ordered by configuration and replicate, workers=1 runs everything in this process;
+    # if store or aggregator is given, the rows are passed to them as they come and None is returned
+    jobs = [(config_ix, params, replicate)
+            for config_ix, params in enumerate(param_configs(param_grid))
+            for replicate in range(M)]
+    rows = run_replicates(heur_class, of_factory, jobs, seed, workers, keep_step_data)
+    return collect_rows(rows, store, aggregator)
+
+
+def run_replicates(heur_class, of_factory, jobs, seed=0, workers=None, keep_step_data=False):
+    # runs replicates given as (config_ix, params, replicate) jobs, returns an iterator over their rows (in the
+    # order of jobs), workers=1 runs everything in this process
+    tasks = [(heur_class, of_factory, params, seed, config_ix, replicate, keep_step_data)
+             for config_ix, params, replicate in jobs]
+    if workers == 1:
+        yield from map(run_replicate, tasks)
+        return
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (4*workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(run_replicate, tasks, chunksize=chunksize)
+
+
+def collect_rows(rows, store, aggregator):
+    if store is None and aggregator is None:
+        return list(rows)
+    for row in rows:
+        if store is not None:
+            store.append(row)
+        if aggregator is not None:
+            aggregator.add(row)
+    if store is not None:
+        store.flush()
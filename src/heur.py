@@ -1,4 +1,10 @@
 import numpy as np
+import itertools
+from collections import OrderedDict
+from rng import UniformBuffer
+from steplog import StepLog, FullLog, EveryKLog
+from instrument import Profiler, NullProfiler
+from checkpoint import save_checkpoint
 
 
 class StopCriterion(Exception):
@@ -11,7 +17,8 @@ class StopCriterion(Exception):
 
 class Heuristic:
 
-    def __init__(self, of, maxeval):
+    def __init__(self, of, maxeval, cache_size=0, cache_count_hits=True, rng=None, profile=False,
+                 checkpoint_path=None, checkpoint_every=None):
         self.of = of
         self.maxeval = maxeval
         self.fstar = of.get_fstar()  # local copy of obj. fun. fstar
@@ -19,41 +26,266 @@ class Heuristic:
         self.best_y = np.inf
         self.best_x = None
         self.neval = 0
-        self.step_data = None
+        self.stop_reason = None  # set when a stop criterion is met
+        self.step_log = StepLog()  # step logging is off unless a heuristic sets up a log (see steplog)
+
+        # random generator, shared with the objective function unless given explicitly
+        self.rng = of.rng if rng is None else np.random.default_rng(rng)
+        self.uniform = UniformBuffer(self.rng)  # pre-drawn uniform random numbers for hot paths
+
+        # optional cache of evaluated points (LRU eviction when cache_size points are stored)
+        self.cache_size = cache_size
+        self.cache_count_hits = cache_count_hits  # do cache hits count toward neval?
+        # (!) with cache_count_hits=False a search revisiting known points only may never stop
+        self.cache = OrderedDict() if cache_size > 0 else None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # optional instrumentation (see instrument), report_end() then contains the 'profile' dict;
+        # per-evaluation code paths test self.profile, so that they are not slowed down when profiling is off
+        self.profile = profile
+        self.profiler = Profiler() if profile else NullProfiler()
+        # observers, called as callback(heur) when a new best point is found and callback(heur, reason) on stop
+        self.improvement_callbacks = []
+        self.stop_callbacks = []
+
+        # optional periodic checkpoints of the search (see checkpoint), searches keep their state in attributes
+        assert checkpoint_path is None or checkpoint_every is not None, \
+            'checkpoint_path needs checkpoint_every (number of evaluations between checkpoints)'
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.next_checkpoint = checkpoint_every if checkpoint_path is not None else np.inf
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['improvement_callbacks'] = []  # observers (often lambdas) are not checkpointed
+        state['stop_callbacks'] = []
+        return state
+
+    def checkpoint(self):
+        # called by searches between iterations, saves a checkpoint once checkpoint_every evaluations passed
+        # (the next checkpoint is scheduled before saving, a resumed search does not rewrite the loaded one)
+        if self.neval >= self.next_checkpoint:
+            self.next_checkpoint = self.neval+self.checkpoint_every
+            save_checkpoint(self, self.checkpoint_path)
+
+    def add_observer(self, on_improvement=None, on_stop=None):
+        if on_improvement is not None:
+            self.improvement_callbacks.append(on_improvement)
+        if on_stop is not None:
+            self.stop_callbacks.append(on_stop)
+
+    def new_best(self, x, y):
+        self.best_y = y
+        self.best_x = x
+        self.profiler.count('improvements')
+        for callback in self.improvement_callbacks:
+            callback(self)
+
+    def stop(self, reason):
+        self.stop_reason = reason
+        for callback in self.stop_callbacks:
+            callback(self, reason)
+        raise StopCriterion(reason)
 
     def evaluate(self, x):
-        y = self.of.evaluate(x)
+        if self.cache is None:
+            if self.profile:
+                with self.profiler.phase('evaluate'):
+                    y = self.of.evaluate(x)
+            else:
+                y = self.of.evaluate(x)
+        else:
+            y, hit = self.cache_get(x, self.of.evaluate, x)
+            if hit and not self.cache_count_hits:
+                return y  # known point can be neither a new best one nor the desired fstar one
         self.neval += 1
         if y < self.best_y:
-            self.best_y = y
-            self.best_x = np.copy(x)
+            self.new_best(np.copy(x), y)
         if y <= self.fstar:
-            raise StopCriterion('Found solution with desired fstar value')
+            self.stop('Found solution with desired fstar value')
         if self.neval == self.maxeval:
-            raise StopCriterion('Exhausted maximum allowed number of evaluations')
+            self.stop('Exhausted maximum allowed number of evaluations')
         return y
 
+    def cache_get(self, x, compute, *args):
+        # value of x from the cache, compute(*args) evaluates it on a miss; returns (value, whether it was a hit)
+        # (no closure over x, it would slow down the callers even when the cache is off)
+        key = np.asarray(x).tobytes()
+        y = self.cache_lookup(key)
+        if y is None:
+            if self.profile:
+                with self.profiler.phase('evaluate'):
+                    y = compute(*args)
+            else:
+                y = compute(*args)
+            self.cache_store(key, y)
+            return y, False
+        return y, True
+
+    def cache_lookup(self, key):
+        # cached value (None on a miss), counts the hit or miss
+        y = self.cache.get(key)
+        if y is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+        return y
+
+    def cache_store(self, key, y):
+        self.cache[key] = y
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)  # evict the least recently used point
+
+    def evaluate_batch(self, X):
+        # evaluates rows of X with a single of.evaluate_batch call, the bookkeeping (neval, best point,
+        # stop criteria) is the same as if the rows were evaluated one by one by evaluate
+        if self.cache is not None:
+            return self.evaluate_batch_cached(X)
+        if self.profile:
+            with self.profiler.phase('evaluate'):
+                ys = self.of.evaluate_batch(X)
+        else:
+            ys = self.of.evaluate_batch(X)
+        self.record_batch(X, ys)
+        return ys
+
+    def evaluate_batch_cached(self, X):
+        # rows missing in the cache (each distinct point once) are evaluated by a single of.evaluate_batch call,
+        # then the cache and the bookkeeping are updated in row order, as if the rows went through evaluate
+        X = np.asarray(X)
+        keys = [x.tobytes() for x in X]
+        values = {key: self.cache[key] for key in keys if key in self.cache}
+        new = {}  # first row of every point missing in the cache
+        for i, key in enumerate(keys):
+            if key not in values:
+                new.setdefault(key, i)
+        if new:
+            if self.profile:
+                with self.profiler.phase('evaluate'):
+                    ys_new = self.of.evaluate_batch(X[list(new.values())])
+            else:
+                ys_new = self.of.evaluate_batch(X[list(new.values())])
+            values.update(zip(new, ys_new))
+        ys = np.array([values[key] for key in keys])
+
+        counted = []  # rows taken by the bookkeeping, up to the one meeting a stop criterion
+        for i, key in enumerate(keys):
+            if self.cache_lookup(key) is None:
+                self.cache_store(key, values[key])
+            elif not self.cache_count_hits:
+                continue  # known point can be neither a new best one nor the desired fstar one
+            counted.append(i)
+            if ys[i] <= self.fstar or self.neval+len(counted) == self.maxeval:
+                break
+        self.record_batch(X[counted], ys[counted])
+        return ys
+
+    def record_batch(self, X, ys):
+        # bookkeeping of values ys of rows of X evaluated in this order
+        hits = np.nonzero(ys <= self.fstar)[0]
+        k = min(len(ys), self.maxeval-self.neval, hits[0]+1 if hits.size > 0 else len(ys))  # rows counted
+        self.neval += k
+        if k > 0:
+            i = np.argmin(ys[:k])
+            if ys[i] < self.best_y:
+                self.new_best(np.copy(X[i]), ys[i])
+        if hits.size > 0 and hits[0] < k:
+            self.stop('Found solution with desired fstar value')
+        if self.neval == self.maxeval:
+            self.stop('Exhausted maximum allowed number of evaluations')
+
+    def evaluate_move(self, state, move):
+        # same as evaluate, for the neighbour of state['x'] given by move (see ObjFun move interface);
+        # with the cache the neighbour is materialized for its key, misses are still evaluated incrementally
+        x = None
+        if self.cache is None:
+            if self.profile:
+                with self.profiler.phase('evaluate'):
+                    y = self.of.evaluate_move(state, move)
+            else:
+                y = self.of.evaluate_move(state, move)
+        else:
+            x = self.of.apply_move(state['x'], move)
+            y, hit = self.cache_get(x, self.of.evaluate_move, state, move)
+            if hit and not self.cache_count_hits:
+                return y
+        self.neval += 1
+        if y < self.best_y:
+            self.new_best(self.of.apply_move(state['x'], move) if x is None else x, y)
+        if y <= self.fstar:
+            self.stop('Found solution with desired fstar value')
+        if self.neval == self.maxeval:
+            self.stop('Exhausted maximum allowed number of evaluations')
+        return y
+
+    # Ask/tell interface, an alternative to search() leaving the evaluation to the caller:
+    #
+    #   while not heur.done():
+    #       X = heur.ask()                         # candidate points, one per row
+    #       heur.tell(X, of.evaluate_batch(X))     # their values, in the same order
+    #   report = heur.report_end()
+    #
+    # The heuristic is a state machine kept in attributes (so it can be checkpointed between tell() and ask()),
+    # the bookkeeping is the same as in search(): values are taken in row order, rows after a stop criterion
+    # is met are ignored. Given the same values, ask/tell draws the same random numbers as search().
+
+    def done(self):
+        return self.stop_reason is not None
+
+    def ask(self):
+        raise NotImplementedError("Heuristic does not implement the ask/tell interface")
+
+    def tell(self, X, ys):
+        assert not self.done(), 'The search has stopped already'
+        ys = np.asarray(ys, dtype=float)
+        try:
+            self.record_batch(X, ys)
+        except StopCriterion:
+            return
+        self.update(X, ys)
+        self.checkpoint()
+
+    def update(self, X, ys):
+        # state transition of the heuristic after its candidates X were evaluated
+        raise NotImplementedError("Heuristic does not implement the ask/tell interface")
+
     def append_log(self, step, params):
-        for param in params:
-            self.step_data[param][step] = params[param]
+        self.step_log.log(step, params)
 
     def report_end(self):
-        return {
+        report = {
             'best_y': self.best_y,
             'best_x': self.best_x,
             'neval': self.neval if self.best_y <= self.fstar else np.inf,
-            'step_data': self.step_data
+            'step_data': self.step_log.data()
         }
+        if self.cache is not None:
+            report['cache_hits'] = self.cache_hits
+            report['cache_misses'] = self.cache_misses
+        if self.profile:
+            report['profile'] = self.profiler.report()
+            report['profile']['counters']['evaluations'] = self.neval
+        return report
 
 
 class ShootAndGo(Heuristic):
 
-    def __init__(self, of, maxeval, hmax=np.inf):
-        Heuristic.__init__(self, of, maxeval)
+    def __init__(self, of, maxeval, hmax=np.inf, **kwargs):
+        Heuristic.__init__(self, of, maxeval, **kwargs)
         self.hmax = hmax
 
+        # ask/tell state: the descent point (None when shooting), the best value of its neighbourhood
+        # and the number of evaluations of the descent
+        self.desc_x = None
+        self.desc_best_y = np.inf
+        self.h = 0
+
     def steepest_descent(self, x):
         # Steepest (Hill) Descent beginning in x
+        if self.of.delta_evaluation:
+            return self.steepest_descent_moves(x)
         desc_best_y = np.inf
         desc_best_x = x
         h = 0
@@ -70,10 +302,34 @@ class ShootAndGo(Heuristic):
                     go = True
                 if h == self.hmax:
                     go = False
+                    break  # the rest of the neighbourhood is never generated
+
+    def steepest_descent_moves(self, x):
+        # Steepest (Hill) Descent beginning in x, neighbours are evaluated incrementally
+        desc_best_y = np.inf
+        state = self.of.get_state(x)
+        h = 0
+        go = True
+        while go and h < self.hmax:
+            go = False
+            desc_best_move = None
+            for move in self.of.get_moves(state['x'], 1):
+                yn = self.evaluate_move(state, move)
+                h += 1
+                if yn < desc_best_y:
+                    desc_best_y = yn
+                    desc_best_move = move
+                    go = True
+                if h == self.hmax:
+                    go = False
+                    break  # the rest of the neighbourhood is never generated
+            if go:
+                state = self.of.update_state(state, desc_best_move)
 
     def search(self):
         try:
             while True:
+                self.checkpoint()
                 # Random Shoot...
                 x = self.of.generate_point()  # global search
                 self.evaluate(x)
@@ -86,67 +342,207 @@ class ShootAndGo(Heuristic):
         except:
             raise
 
+    def ask(self):
+        if self.desc_x is None:
+            return np.array([self.of.generate_point()])
+        limit = None if self.hmax == np.inf else int(self.hmax-self.h)
+        return np.array(list(itertools.islice(self.of.get_neighborhood(self.desc_x, 1), limit)))
+
+    def update(self, X, ys):
+        if self.desc_x is None:  # a random shot
+            if self.hmax > 0:
+                self.desc_x = X[0]
+                self.desc_best_y = np.inf
+                self.h = 0
+            return
+        self.h += len(ys)
+        if len(ys) > 0 and np.min(ys) < self.desc_best_y and self.h < self.hmax:  # go on descending
+            i = np.argmin(ys)
+            self.desc_best_y = ys[i]
+            self.desc_x = X[i]
+        else:
+            self.desc_x = None
+
 
 class FSA(Heuristic):
 
-    def __init__(self, of, maxeval, T0, n0, alpha, r):
-        Heuristic.__init__(self, of, maxeval)
+    SCALAR_FIELDS = ('T', 'mut_size', 'f_x', 'f_y')  # logged by default for vector domains
+
+    def __init__(self, of, maxeval, T0, n0, alpha, r, step_log=None, **kwargs):
+        Heuristic.__init__(self, of, maxeval, **kwargs)
 
         self.T0 = T0
         self.n0 = n0
         self.alpha = alpha
         self.r = r
-        self.step_data = {
-            'T': np.empty(maxeval)*np.nan,
-            'mut_size': np.empty(maxeval)*np.nan,
-            'x': np.zeros(maxeval, dtype=int)*np.nan,
-            'f_x': np.empty(maxeval)*np.nan,
-            'y': np.zeros(maxeval, dtype=int)*np.nan,
-            'f_y': np.empty(maxeval)*np.nan
-        }
+        # steps are logged into columns 'T', 'mut_size', 'x', 'f_x', 'y' and 'f_y' (every step by default,
+        # vector points x and y are logged by default only for scalar domains)
+        if step_log is None:
+            step_log = FullLog(maxeval) if np.ndim(self.a) == 0 else FullLog(maxeval, fields=self.SCALAR_FIELDS)
+        self.step_log = step_log
+        # every checkpoint stores the whole log, it has to be bounded (StepLog, RingLog or DiskLog)
+        assert self.checkpoint_path is None or not isinstance(step_log, (FullLog, EveryKLog)), \
+            'Checkpointed searches need a bounded step log, e.g. step_log=StepLog() or DiskLog(path)'
+
+        # search state, the current point and its value
+        self.x = None
+        self.f_x = None
+        self.k = 0  # step of the mutant handed out by ask()
 
     def mutate(self, x):
         # Discrete Cauchy mutation (TO BE GENERALIZED!)
         n = np.size(x)
-        u = np.random.uniform(low=0.0, high=1.0, size=n)
+        u = self.uniform.take(n).reshape(np.shape(x))  # mutant has the shape of x (scalar or vector)
         r = self.r
         x_new = x + r*np.tan(np.pi * (u-1/2))
 
         x_new_corrected = np.minimum(np.maximum(x_new, self.a), self.b)
         return np.array(np.round(x_new_corrected), dtype=int)
 
+    def temperature(self, k):
+        # cooling schedule, k may be an array
+        T0 = self.T0
+        n0 = self.n0
+        alpha = self.alpha
+        return T0/(1+(k/n0)**alpha) if alpha > 0 else T0*np.exp(-(k/n0)**-alpha)
+
     def search(self):
         try:
-            x = self.of.generate_point()
-            f_x = self.evaluate(x)
-            Heuristic.append_log(self, 0, {'x': x, 'f_x': f_x})
+            if self.x is None:  # otherwise a search resumed from a checkpoint goes on
+                self.x = self.of.generate_point()
+                self.f_x = self.evaluate(self.x)
+                Heuristic.append_log(self, 0, {'x': self.x, 'f_x': self.f_x})
             while True:
+                self.checkpoint()
+                x = self.x
+                f_x = self.f_x
                 k = self.neval
-                T0 = self.T0
-                n0 = self.n0
-                alpha = self.alpha
 
-                y = self.mutate(x)
+                if self.profile:
+                    with self.profiler.phase('mutate'):
+                        y = self.mutate(x)
+                else:
+                    y = self.mutate(x)
                 Heuristic.append_log(self, k, {'x': x, 'f_x': f_x, 'mut_size': np.linalg.norm(x-y), 'y': y})
                 f_y = self.evaluate(y)
 
-                T = T0/(1+(k/n0)**alpha) if alpha > 0 else T0*np.exp(-(k/n0)**-alpha)
+                T = self.temperature(k)
                 s = (f_x - f_y)/T
-                if np.random.uniform() < 1/2 + np.arctan(s)/np.pi:
-                    x = y
-                    f_x = f_y
-                Heuristic.append_log(self, k, {'T': T})
+                if self.uniform.next() < 1/2 + np.arctan(s)/np.pi:
+                    self.x = y
+                    self.f_x = f_y
+                    if self.profile:
+                        self.profiler.count('accepted')
+                Heuristic.append_log(self, k, {'T': T, 'f_y': f_y})
 
         except StopCriterion:
             return self.report_end()
         except:
             raise
 
+    def ask(self):
+        if self.x is None:
+            return np.array([self.of.generate_point()])
+        self.k = self.neval
+        if self.profile:
+            with self.profiler.phase('mutate'):
+                y = self.mutate(self.x)
+        else:
+            y = self.mutate(self.x)
+        Heuristic.append_log(self, self.k, {'x': self.x, 'f_x': self.f_x, 'mut_size': np.linalg.norm(self.x-y), 'y': y})
+        return np.array([y])
+
+    def update(self, X, ys):
+        if self.x is None:
+            self.x = X[0]
+            self.f_x = ys[0]
+            Heuristic.append_log(self, 0, {'x': self.x, 'f_x': self.f_x})
+            return
+        T = self.temperature(self.k)
+        s = (self.f_x - ys[0])/T
+        if self.uniform.next() < 1/2 + np.arctan(s)/np.pi:
+            self.x = X[0]
+            self.f_x = ys[0]
+            if self.profile:
+                self.profiler.count('accepted')
+        Heuristic.append_log(self, self.k, {'T': T, 'f_y': ys[0]})
+
+
+class MultiFSA(FSA):
+
+    # K independent FSA chains advanced in lockstep: mutation, cooling, acceptance and evaluation are K-wide
+    # array operations. Every chain keeps its own bookkeeping equivalent to Heuristic.evaluate (neval, best
+    # point, stop on fstar or maxeval), search() returns the list of K report_end() dicts -- so it can not be
+    # run by experiment.run_experiment (one report per replicate), run FSA replicates there instead.
+    # Steps are not logged, observers are not called, checkpoints and ask/tell are not supported.
+
+    def __init__(self, of, maxeval, T0, n0, alpha, r, K, **kwargs):
+        assert 'step_log' not in kwargs, 'MultiFSA does not log steps'
+        assert kwargs.get('checkpoint_path') is None, 'MultiFSA does not support checkpoints'
+        FSA.__init__(self, of, maxeval, T0, n0, alpha, r, step_log=StepLog(), **kwargs)
+        self.K = K
+
+    def add_observer(self, on_improvement=None, on_stop=None):
+        raise NotImplementedError("MultiFSA does not call observers")
+
+    def ask(self):
+        raise NotImplementedError("MultiFSA does not implement the ask/tell interface")
+
+    def tell(self, X, ys):
+        raise NotImplementedError("MultiFSA does not implement the ask/tell interface")
+
+    def update(self, X, ys):
+        raise NotImplementedError("MultiFSA does not implement the ask/tell interface")
+
+    def search(self):
+        x = np.array([self.of.generate_point() for i in np.arange(self.K)], dtype=int)  # one chain per row
+        f_x = self.of.evaluate_batch(x)
+        neval = np.ones(self.K, dtype=int)
+        best_x = x.copy()
+        best_y = f_x.copy()
+        active = (f_x > self.fstar) & (neval < self.maxeval)  # chains that did not stop yet
+        while np.any(active):
+            ix = np.nonzero(active)[0]
+            k = neval[ix]
+
+            with self.profiler.phase('mutate'):
+                y = self.mutate(x[ix])
+            with self.profiler.phase('evaluate'):
+                f_y = self.of.evaluate_batch(y)
+            neval[ix] += 1
+            better = f_y < best_y[ix]
+            best_x[ix[better]] = y[better]
+            best_y[ix[better]] = f_y[better]
+
+            T = self.temperature(k)
+            with np.errstate(divide='ignore', invalid='ignore'):  # T = 0 (or inf) is allowed, as in FSA
+                s = (f_x[ix] - f_y)/T
+            accept = self.uniform.take(np.size(ix)) < 1/2 + np.arctan(s)/np.pi
+            x[ix[accept]] = y[accept]
+            f_x[ix[accept]] = f_y[accept]
+            self.profiler.count('improvements', int(np.count_nonzero(better)))
+            self.profiler.count('accepted', int(np.count_nonzero(accept)))
+
+            active[ix] = (f_y > self.fstar) & (neval[ix] < self.maxeval)
+
+        reports = [{
+            'best_y': best_y[i],
+            'best_x': best_x[i],
+            'neval': neval[i] if best_y[i] <= self.fstar else np.inf,
+            'step_data': None
+        } for i in np.arange(self.K)]
+        if self.profile:  # one profile of all chains, shared by the reports
+            profile = self.profiler.report()
+            profile['counters']['evaluations'] = int(np.sum(neval))
+            for report in reports:
+                report['profile'] = profile
+        return reports
+
 
 class GO(Heuristic):
 
-    def __init__(self, of, maxeval, n, m, t_sel1, t_sel2, r, co_m):
-        Heuristic.__init__(self, of, maxeval)
+    def __init__(self, of, maxeval, n, m, t_sel1, t_sel2, r, co_m, **kwargs):
+        Heuristic.__init__(self, of, maxeval, **kwargs)
 
         assert m > n, 'M should be larger than N'
         self.n = n  # population size
@@ -156,86 +552,165 @@ class GO(Heuristic):
         self.r = r  # mutation radius
         self.co_m = co_m  # number of crossover points    m=m+1  # m = number of crossover points
 
+        # search state, the sorted population and its fitness
+        self.pop_x = None
+        self.pop_f = None
+
     @staticmethod
-    def sort_pop(pop_x, pop_f):
-        ixs = np.argsort(pop_f)
+    def sort_pop(pop_x, pop_f, n=None):
+        # sorts population according to fitness, only the best n individuals are kept if n is given
+        if n is None or n >= np.size(pop_f):
+            ixs = np.argsort(pop_f)
+        else:
+            ixs = np.argpartition(pop_f, n-1)[:n]  # best n individuals in arbitrary order
+            ixs = ixs[np.argsort(pop_f[ixs])]
         pop_x = pop_x[ixs]
         pop_f = pop_f[ixs]
         return [pop_x, pop_f]
 
-    @staticmethod
-    def rank_select(temp, n_max):
-        u = np.random.uniform(low=0.0, high=1.0, size=1)
+    def rank_select(self, temp, n_max, size=1):
+        u = self.uniform.take(size)
         ix = np.minimum(np.ceil(-temp*np.log(u)), n_max)-1
         return ix.astype(int)
 
+    def rank_select_unique(self, temp, n_max, size):
+        # selects size distinct indices out of n_max (without replacement), index i (i.e. rank i+1) is chosen
+        # with weight exp(-i/temp) among the indices not selected yet -- Gumbel top-k trick: the size largest
+        # log-weights perturbed by Gumbel noise win
+        if temp == 0:
+            return np.arange(size)
+        u = self.uniform.take(n_max)
+        keys = -np.arange(n_max)/temp-np.log(-np.log(u))
+        return np.argpartition(-keys, size-1)[:size]
+
     def mutate(self, x):
-        # Discrete Cauchy mutation (TO BE GENERALIZED!)
+        # Discrete Cauchy mutation (TO BE GENERALIZED!), x may be a single point or a population (one point per row)
         n = np.size(x)
-        u = np.random.uniform(low=0.0, high=1.0, size=n)
+        u = self.uniform.take(n).reshape(np.shape(x))
         r = self.r
         x_new = x + r*np.tan(np.pi * (u-1/2))
 
         x_new_corrected = np.minimum(np.maximum(x_new, self.a), self.b)
         return np.array(np.round(x_new_corrected), dtype=int)
 
-    def crossover(self, x, y):
+    def crossover_mask(self, n):
+        # True where the child inherits from the first parent (odd segments), False for the second one
         m = self.co_m+1  # m = number of crossover points
-        n = np.size(x)
-        z = x*0
-        k = 0
-        p = np.ceil(n/m).astype(int)
-        for i in np.arange(1, m+1):
-            ix_from = k
-            ix_to = np.minimum(k+p, n)
-            z[ix_from:ix_to] = x[ix_from:ix_to] if np.mod(i, 2) == 1 else y[ix_from:ix_to]
-            k += p
-        return z
+        p = np.ceil(n/m).astype(int)  # segment length
+        return (np.arange(n) // p) % 2 == 0
+
+    def crossover(self, x, y):
+        # x, y may be single points or populations of pairs (one point per row)
+        return np.where(self.crossover_mask(np.shape(x)[-1]), x, y)
+
+    def random_pop(self):
+        pop_x = np.array([self.of.generate_point() for i in np.arange(self.n)], dtype=int)  # population solution vectors
+        return pop_x.reshape(self.n, np.size(self.a))
+
+    def init_pop(self):
+        # a.) generate the population
+        pop_x = self.random_pop()
+        pop_f = self.evaluate_batch(pop_x)  # population fitness (objective) function values
+
+        # b.) sort according to fitness function
+        with self.profiler.phase('sort_pop'):
+            return self.sort_pop(pop_x, pop_f)
+
+    def breed(self, pop_x, size):
+        # generates (and evaluates) size offspring of the sorted population
+        z_mut = self.offspring(pop_x, size)
+        return [z_mut, self.evaluate_batch(z_mut)]
+
+    def offspring(self, pop_x, size):
+        with self.profiler.phase('select'):
+            par_a_ix = self.rank_select(temp=self.t_sel1, n_max=self.n, size=size)  # select first parents
+            par_b_ix = self.rank_select(temp=self.t_sel1, n_max=self.n, size=size)  # select second parents (uniqueness not guaranteed!)
+        with self.profiler.phase('crossover'):
+            z = self.crossover(pop_x[par_a_ix], pop_x[par_b_ix])
+        with self.profiler.phase('mutate'):
+            return self.mutate(z)
+
+    def next_generation(self, work_pop_x, work_pop_f):
+        # 2.) sort working population according to fitness function
+        # (with t_sel2 = 0 the best n individuals survive, the rest need not be sorted)
+        with self.profiler.phase('sort_pop'):
+            [work_pop_x, work_pop_f] = self.sort_pop(work_pop_x, work_pop_f, self.n if self.t_sel2 == 0 else None)
+
+        # 3.) select the new population (without duplicates)
+        with self.profiler.phase('select'):
+            sel_ixs = self.rank_select_unique(temp=self.t_sel2, n_max=np.size(work_pop_f), size=self.n)
+
+        # 4.) sort according to fitness function -- selected ranks in ascending order keep the
+        # new population sorted, as the working population is sorted already
+        sel_ixs = np.sort(sel_ixs)
+        self.pop_x = work_pop_x[sel_ixs]
+        self.pop_f = work_pop_f[sel_ixs]
 
     def search(self):
         try:
-            # Initialization:
-            pop_x = np.zeros([self.n, np.size(self.a)], dtype=int)  # population solution vectors
-            pop_f = np.zeros(self.n)  # population fitness (objective) function values
-            # a.) generate the population
-            for i in np.arange(self.n):
-                x = self.of.generate_point()
-                pop_x[i, :] = x
-                pop_f[i] = self.evaluate(x)
-
-            # b.) sort according to fitness function
-            [pop_x, pop_f] = self.sort_pop(pop_x, pop_f)
+            # Initialization (unless the search is resumed from a checkpoint):
+            if self.pop_x is None:
+                [self.pop_x, self.pop_f] = self.init_pop()
 
             # Evolution iteration
             while True:
+                self.checkpoint()
+
                 # 1.) generate the working population
-                work_pop_x = np.zeros([self.m, np.size(self.a)], dtype=int)
-                work_pop_f = np.zeros(self.m)
-                for i in np.arange(self.m):
-                    par_a_ix = self.rank_select(temp=self.t_sel1, n_max=self.n)  # select first parent
-                    par_b_ix = self.rank_select(temp=self.t_sel1, n_max=self.n)  # select second parent (uniqueness not guaranteed!)
-                    par_a = pop_x[par_a_ix, :][0]
-                    par_b = pop_x[par_b_ix, :][0]
-                    z = self.crossover(par_a, par_b)
-                    z_mut = self.mutate(z)
-                    work_pop_x[i, :] = z_mut
-                    work_pop_f[i] = self.evaluate(z_mut)
-
-                # 2.) sort working population according to fitness function
-                [work_pop_x, work_pop_f] = self.sort_pop(work_pop_x, work_pop_f)
-
-                # 3.) select the new population
-                ixs_not_selected = np.ones(self.m, dtype=bool)  # this mask will prevent us from selecting duplicates
-                for i in np.arange(self.n):
-                    sel_ix = self.rank_select(temp=self.t_sel2, n_max=np.sum(ixs_not_selected))
-                    pop_x[i, :] = work_pop_x[ixs_not_selected][sel_ix, :]
-                    pop_f[i] = work_pop_f[ixs_not_selected][sel_ix]
-                    ixs_not_selected[sel_ix] = False
-
-                # 4.) sort according to fitness function
-                [pop_x, pop_f] = self.sort_pop(pop_x, pop_f)
+                [work_pop_x, work_pop_f] = self.breed(self.pop_x, self.m)
+
+                # 2.) - 4.) the new population
+                self.next_generation(work_pop_x, work_pop_f)
 
         except StopCriterion:
             return self.report_end()
         except:
             raise
+
+    def ask(self):
+        if self.pop_x is None:
+            return self.random_pop()
+        return self.offspring(self.pop_x, self.m)
+
+    def update(self, X, ys):
+        if self.pop_x is None:
+            with self.profiler.phase('sort_pop'):
+                [self.pop_x, self.pop_f] = self.sort_pop(X, ys)
+        else:
+            self.next_generation(X, ys)
+
+
+class SteadyStateGO(GO):
+
+    # Steady-state variant of GO: there are no generations, each offspring is inserted into the sorted
+    # population by binary search and pushes the worst individual out (only individuals behind the insertion
+    # point are moved). Offspring are bred (and evaluated) in batches of m.
+
+    def __init__(self, of, maxeval, n, m, t_sel1, r, co_m, **kwargs):
+        Heuristic.__init__(self, of, maxeval, **kwargs)
+
+        self.n = n  # population size
+        self.m = m  # number of offspring bred at once
+        self.t_sel1 = t_sel1  # parent selection temperature
+        self.r = r  # mutation radius
+        self.co_m = co_m  # number of crossover points
+        self.pop_x = None
+        self.pop_f = None
+
+    @staticmethod
+    def insert(pop_x, pop_f, x, f):
+        # inserts individual into the sorted population (in place), returns its position (n if not inserted)
+        n = np.size(pop_f)
+        pos = np.searchsorted(pop_f, f, side='right')  # after individuals of the same fitness
+        if pos < n:
+            pop_x[pos+1:] = pop_x[pos:-1]
+            pop_f[pos+1:] = pop_f[pos:-1]
+            pop_x[pos] = x
+            pop_f[pos] = f
+        return pos
+
+    def next_generation(self, off_x, off_f):
+        # the population is updated in place (search() is inherited from GO)
+        with self.profiler.phase('sort_pop'):
+            for i in np.nonzero(off_f < self.pop_f[-1])[0]:  # the others would not make it into the population
+                self.insert(self.pop_x, self.pop_f, off_x[i], off_f[i])
@@ -0,0 +1,72 @@
+import time
+from collections import defaultdict
+
+
+# Opt-in instrumentation of heuristics (see Heuristic profile argument): wall-clock time spent in phases
+# of a run (evaluate, mutate, crossover, ...) and event counters (improvements, accepted moves, ...).
+#
+#   with profiler.phase('mutate'):
+#       y = mutate(x)
+#   profiler.count('accepted')
+
+
+class Phase:
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.profiler.times[self.name] += time.perf_counter()-self.start
+        self.profiler.calls[self.name] += 1
+
+
+class Profiler:
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def count(self, name, k=1):
+        self.counters[name] += k
+
+    def report(self):
+        return {
+            'total_time': time.perf_counter()-self.start,  # since the profiler (i.e. the heuristic) was created
+            'phase_time': dict(self.times),
+            'phase_calls': dict(self.calls),
+            'counters': dict(self.counters)
+        }
+
+
+class NullPhase:
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+class NullProfiler:
+
+    # disabled instrumentation, all methods are no-ops
+
+    null_phase = NullPhase()
+
+    def phase(self, name):
+        return self.null_phase
+
+    def count(self, name, k=1):
+        pass
+
+    def report(self):
+        return None
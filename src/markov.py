@@ -0,0 +1,141 @@
+import numpy as np
+from heur import ShootAndGo, FSA
+from steplog import StepLog
+
+
+# Exact analysis of ShootAndGo and FSA on small discrete objective functions (e.g. AirShip, Zebra3 with
+# small d): instead of estimating rel, mne and feo from many runs, the search is treated as a Markov chain
+# over the enumerated domain and the distribution of neval (number of evaluations until a point with
+# f <= fstar is evaluated) within maxeval is computed exactly.
+#
+#   res = shoot_and_go_chain(AirShip(-100, 0, 800), hmax=100, maxeval=1000)
+#   res['rel'], res['mne'], res['feo']  # the same statistics as the notebook helpers compute from runs
+#
+# Both heuristics generate random points uniformly over the box [a, b] of the objective function.
+
+
+def enumerate_domain(of):
+    # all points of the (integer) domain, one per row (a 1-D array for scalar domains)
+    a = np.atleast_1d(of.a).astype(int)
+    b = np.atleast_1d(of.b).astype(int)
+    grids = np.meshgrid(*[np.arange(ai, bi+1) for ai, bi in zip(a, b)], indexing='ij')
+    X = np.stack([g.ravel() for g in grids], axis=1)
+    return X[:, 0] if np.ndim(of.a) == 0 else X
+
+
+def neval_stats(p_neval):
+    # rel, mne and feo from the distribution of neval, p_neval[n-1] = P(neval = n)
+    n = np.arange(1, np.size(p_neval)+1)
+    rel = np.sum(p_neval)
+    mne = np.sum(n*p_neval)/rel if rel > 0 else np.nan
+    feo = mne/rel if rel > 0 else np.nan
+    return {'rel': rel, 'mne': mne, 'feo': feo, 'p_neval': p_neval}
+
+
+class TraceShootAndGo(ShootAndGo):
+
+    # records objective values of all evaluations, without any stop criteria
+
+    def evaluate(self, x):
+        y = self.of.evaluate(x)
+        self.trace.append(y)
+        return y
+
+    def evaluate_move(self, state, move):
+        y = self.of.evaluate_move(state, move)
+        self.trace.append(y)
+        return y
+
+    def shoot_and_go(self, x):
+        # objective values of evaluations made by one random shot to x and the following descent
+        self.trace = []
+        self.evaluate(x)
+        if self.hmax > 0:
+            self.steepest_descent(x)
+        return self.trace
+
+
+def shoot_and_go_chain(of, hmax, maxeval):
+    # ShootAndGo is a sequence of independent episodes (a random shot and a deterministic descent from it),
+    # so the distribution of neval follows from episode lengths and success times by a renewal recursion
+    tracer = TraceShootAndGo(of, maxeval=np.inf, hmax=hmax)
+    X = enumerate_domain(of)
+    p_fail = {}  # P(episode fails and makes l evaluations)
+    p_success = {}  # P(episode evaluates a point with f <= fstar first in its t-th evaluation)
+    for x in X:
+        trace = np.array(tracer.shoot_and_go(x))
+        hits = np.nonzero(trace <= of.get_fstar())[0]
+        if hits.size > 0:
+            p_success[hits[0]+1] = p_success.get(hits[0]+1, 0)+1/len(X)
+        else:
+            p_fail[len(trace)] = p_fail.get(len(trace), 0)+1/len(X)
+
+    p_start = np.zeros(maxeval+1)  # P(an episode starts after c evaluations without success)
+    p_start[0] = 1
+    p_neval = np.zeros(maxeval)
+    for c in np.arange(maxeval):
+        if p_start[c] == 0:
+            continue
+        for t, p in p_success.items():
+            if c+t <= maxeval:
+                p_neval[c+t-1] += p_start[c]*p
+        for l, p in p_fail.items():
+            if c+l < maxeval:
+                p_start[c+l] += p_start[c]*p
+
+    res = neval_stats(p_neval)
+    # expected neval without the maxeval limit: (E[failed episodes] * mean failed length + mean success time)
+    p = sum(p_success.values())
+    res['expected_neval'] = (sum(l*q for l, q in p_fail.items())+sum(t*q for t, q in p_success.items()))/p \
+        if p > 0 else np.inf
+    return res
+
+
+def cauchy_mutation_matrix(of, X, r):
+    # M[i, j] = probability that FSA.mutate turns X[i] into X[j] (coordinates are mutated independently)
+    X2 = X.reshape(len(X), -1)
+    a = np.broadcast_to(np.atleast_1d(of.a), X2.shape[1:]).astype(int)
+    b = np.broadcast_to(np.atleast_1d(of.b), X2.shape[1:]).astype(int)
+    M = np.ones((len(X), len(X)))
+    for c in np.arange(X2.shape[1]):
+        v = np.arange(a[c], b[c]+1)
+        # mutant x + r*C (C standard Cauchy) is clipped to [a, b] and rounded to w
+        lo = np.where(v == a[c], -np.inf, v-0.5)
+        hi = np.where(v == b[c], np.inf, v+0.5)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cdf_hi = 1/2+np.arctan((hi[np.newaxis, :]-v[:, np.newaxis])/r)/np.pi
+            cdf_lo = 1/2+np.arctan((lo[np.newaxis, :]-v[:, np.newaxis])/r)/np.pi
+        Q = cdf_hi-cdf_lo  # Q[v, w] for the coordinate c
+        M *= Q[X2[:, c, np.newaxis]-a[c], X2[np.newaxis, :, c]-a[c]]
+    return M
+
+
+def fsa_chain(of, maxeval, T0, n0, alpha, r):
+    # FSA is a time-inhomogeneous Markov chain over the domain, the distribution of its current point
+    # (restricted to runs that did not stop yet) is propagated step by step
+    fsa = FSA(of, maxeval, T0, n0, alpha, r, step_log=StepLog())  # cooling schedule
+    X = enumerate_domain(of)
+    f = of.evaluate_batch(X)
+    target = f <= of.get_fstar()
+    M = cauchy_mutation_matrix(of, X, r)
+    M_target = M[:, target].sum(axis=1)  # probability of mutating into a target point
+    M = M[:, ~target]
+    # acceptance depends on f_x - f_y only, it is computed for distinct differences and gathered
+    diffs, diff_ix = np.unique(f[:, np.newaxis]-f[np.newaxis, ~target], return_inverse=True)
+    diff_ix = diff_ix.reshape(len(X), -1)
+
+    p_neval = np.zeros(maxeval)
+    p_neval[0] = np.mean(target)
+    p = np.where(target, 0, 1/len(X))  # P(current point is x and the run goes on)
+    for k in np.arange(1, maxeval):
+        p_neval[k] = p @ M_target
+        T = fsa.temperature(k)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            A = 1/2+np.arctan(diffs/T)/np.pi  # acceptance probabilities
+        A = np.nan_to_num(A, nan=0.0)  # as in FSA, u < nan is never true
+        P = M*A[diff_ix]
+        stay = 1-M_target-P.sum(axis=1)  # rejected mutants
+        p_next = np.zeros(len(X))
+        p_next[~target] = p @ P
+        p = p_next+p*stay
+    return neval_stats(p_neval)
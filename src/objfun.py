@@ -1,12 +1,16 @@
 import numpy as np
+from bisect import bisect_left
 
 
 class ObjFun:
 
-    def __init__(self, fstar, a, b):
+    delta_evaluation = False  # True if the objective function implements the move interface below
+
+    def __init__(self, fstar, a, b, rng=None):
         self.fstar = fstar
         self.a = a
         self.b = b
+        self.rng = np.random.default_rng(rng)  # random generator (or a seed of a new one)
 
     def get_fstar(self):
         return self.fstar
@@ -18,145 +22,349 @@ class ObjFun:
         raise NotImplementedError("Objective function must implement random point generation")
 
     def get_neighborhood(self, x, d):
+        # an iterable of the neighbours of x, possibly a generator (list(...) materializes it)
         return x
 
     def evaluate(self, x):
         raise NotImplementedError("Objective function must implement objective function evaluation")
 
+    def evaluate_batch(self, X):
+        # evaluates k candidates at once, X is an array with one candidate per row
+        # (generic fallback, objective functions should override it with a vectorized kernel)
+        return np.array([self.evaluate(x) for x in X], dtype=float)
+
+    # Move interface (incremental evaluation of neighbours):
+    #   state = get_state(x)  -- point x with cached data, state['x'] is the point, state['f'] its value
+    #   for move in get_moves(x, d):  -- neighbourhood of x described by moves instead of points
+    #       y = evaluate_move(state, move)  -- value of the neighbour, computed from the cached data only
+    #   state = update_state(state, move)  -- moves to the neighbour
+
+    def get_state(self, x):
+        raise NotImplementedError("Objective function does not support incremental evaluation")
+
+    def get_moves(self, x, d):
+        raise NotImplementedError("Objective function does not support incremental evaluation")
+
+    def evaluate_move(self, state, move):
+        raise NotImplementedError("Objective function does not support incremental evaluation")
+
+    def apply_move(self, x, move):
+        raise NotImplementedError("Objective function does not support incremental evaluation")
+
+    def update_state(self, state, move):
+        return self.get_state(self.apply_move(state['x'], move))
+
 
 class AirShip(ObjFun):
 
+    def __init__(self, fstar, a, b, rng=None):
+        ObjFun.__init__(self, fstar, a, b, rng)
+        px = np.array([0,  50, 100, 300, 400, 700, 800], dtype=int)
+        py = np.array([0, 100,   0,   0,  25,   0,  50], dtype=int)
+        self.domain = np.arange(a, b+1)  # all points of the domain, neighbourhoods are slices of it
+        self.terrain = np.interp(self.domain, px, py)  # altitude of every point of the domain
+        self.values = -self.terrain  # negative altitude, becase we are minimizing (as opposed to the first example...)
+
     def generate_point(self):
-        return np.random.randint(self.a, self.b+1)
+        return self.rng.integers(self.a, self.b+1)
 
     def get_neighborhood(self, x, d):
-        left = [x for x in np.arange(x-1, x-d-1, -1) if x >= 0]
-        right = [x for x in np.arange(x+1, x+d+1) if x <= 800]
+        ix = x-self.a  # position of x in the domain table
+        left = self.domain[max(ix-d, 0):ix][::-1]  # x-1, x-2, ..., x-d
+        right = self.domain[ix+1:ix+d+1]  # x+1, x+2, ..., x+d
         return np.concatenate((left, right))
 
     def evaluate(self, x):
-        px = np.array([0,  50, 100, 300, 400, 700, 800], dtype=int)
-        py = np.array([0, 100,   0,   0,  25,   0,  50], dtype=int)
-        xx = np.arange(0, 800+1)
-        yy = np.interp(xx, px, py)
-        return -yy[x]  # negative altitude, becase we are minimizing (as opposed to the first example...)
+        return self.values[x-self.a]
+
+    def evaluate_batch(self, X):
+        # X holds one point per element, or per row of a (k, 1) population (e.g. of GO)
+        return self.values[np.asarray(X, dtype=int).reshape(len(X))-self.a]
 
 
 class Zebra3(ObjFun):
 
-    def __init__(self, d):
+    delta_evaluation = True
+
+    # contribution of a 3-bit block in tenths (integers keep sums exact, incremental updates included):
+    # rows = odd/even block (1-based), columns = number of ones in the block
+    block_values = np.array([[10, 3, 6, 9],
+                             [9, 6, 3, 10]])
+
+    def __init__(self, d, rng=None):
         self.fstar = 0
         self.d = d
         self.n = d*3
         self.a = np.zeros(self.n)
         self.b = np.ones(self.n)
+        self.rng = np.random.default_rng(rng)
 
     def generate_point(self):
-        return np.random.randint(0, 1+1, self.n)
+        return self.rng.integers(0, 1+1, self.n)
 
     def get_neighborhood(self, x, d):
         assert d == 1, "Zebra3 supports neighbourhood with (Hamming) distance = 1 only"
-        nd = []
-        for i, xi in enumerate(x):
-            xx = x.copy()
-            xx[i] = 0 if xi == 1 else 1
-            nd.append(xx)
-        return nd
+        # neighbours are generated lazily, one copy of x at a time
+        return (self.apply_move(x, i) for i in range(self.n))
 
     def evaluate(self, x):
-        f = 0
-        for i in np.arange(1, self.d+1):
-            xr = x[(i-1)*3:i*3]
-            s = np.sum(xr)
-            if np.mod(i,2) == 0:
-                if s == 0:
-                    f += 0.9
-                elif s == 1:
-                    f += 0.6
-                elif s == 2:
-                    f += 0.3
-                else:  # s == 3
-                    f += 1.0
-            else:
-                if s == 0:
-                    f += 1.0
-                elif s == 1:
-                    f += 0.3
-                elif s == 2:
-                    f += 0.6
-                else:  # s == 3
-                    f += 0.9
-        f = self.n/3-f
-        return f
+        return self.evaluate_batch(np.reshape(x, (1, self.n)))[0]
+
+    def evaluate_batch(self, X):
+        X = np.asarray(X, dtype=int)
+        s = X.reshape(-1, self.d, 3).sum(axis=2)  # number of ones in every block, shape (k, d)
+        parity = np.arange(self.d) % 2  # blocks 1, 3, 5, ... are odd (row 0 of the table)
+        f = self.block_values[parity, s].sum(axis=1)
+        return self._value(f)
+
+    def _value(self, f):
+        # objective function value from the sum of block contributions (in tenths)
+        return (10*self.d-f)/10
+
+    def get_state(self, x):
+        x = np.array(x, dtype=int)
+        s = x.reshape(self.d, 3).sum(axis=1)  # number of ones in every block
+        g = self.block_values[np.arange(self.d) % 2, s].sum()  # sum of block contributions
+        return {'x': x, 's': s, 'g': g, 'f': self._value(g)}
+
+    def get_moves(self, x, d):
+        assert d == 1, "Zebra3 supports neighbourhood with (Hamming) distance = 1 only"
+        return range(self.n)  # move i flips bit x[i]
+
+    def evaluate_move(self, state, move):
+        j = move // 3  # block of the flipped bit
+        s = state['s'][j]
+        s_new = s+1-2*state['x'][move]
+        return self._value(state['g']-self.block_values[j % 2, s]+self.block_values[j % 2, s_new])
+
+    def apply_move(self, x, move):
+        x = np.array(x, dtype=int)
+        x[move] = 1-x[move]
+        return x
+
+    def update_state(self, state, move):
+        j = move // 3
+        x = self.apply_move(state['x'], move)
+        s = state['s'].copy()
+        s[j] += 2*x[move]-1
+        g = state['g']-self.block_values[j % 2, state['s'][j]]+self.block_values[j % 2, s[j]]
+        return {'x': x, 's': s, 'g': g, 'f': self._value(g)}
 
 
 class TSPGrid(ObjFun):
 
-    def __init__(self, par_a, par_b, norm=2):
-        n = par_a * par_b  # number of cities
+    delta_evaluation = True
 
-        # compute city coordinates
-        grid = np.zeros((n, 2), dtype=np.int)
-        for i in np.arange(par_a):
-            for j in np.arange(par_b):
-                grid[i * par_b + j]=np.array([i, j])
+    def __init__(self, par_a, par_b, norm=2, dense=False, rng=None):
+        n = par_a * par_b  # number of cities
 
-        # compute distances
-        dist = np.zeros((n, n))
-        for i in np.arange(n):
-            for j in np.arange(i+1, n):
-                dist[i, j] = np.linalg.norm(grid[i, :]-grid[j, :], norm)
-                dist[j, i] = dist[i, j]
+        # city i lies at grid coordinates [i // par_b, i % par_b], so distances have a closed form
+        # and are computed on demand by distance(), the dense distance matrix is optional
+        self.par_a = par_a
+        self.par_b = par_b
+        self.norm = norm
 
-        self.fstar = n+np.mod(n, 2)*(2**(1/norm)-1)
         self.n = n
-        self.dist = dist
-        self.a = np.zeros(n-1, dtype=np.int)  # n-1 because the first city is pre-determined
+        self.dist = None
+        if dense:
+            cities = np.arange(n)
+            self.dist = self.distance(cities[:, np.newaxis], cities[np.newaxis, :])
+
+        # Tour lengths are computed from the numbers of edges of every distinct length (see tour_length), so the
+        # length of a tour does not depend on how it was obtained (full or incremental evaluation, see
+        # evaluate_move) and equal tours compare exactly. An edge between cities differing by (dx, dy) grid steps
+        # is of class dx*par_b+dy, the length of class c is the distance of cities 0 and c.
+        self.lengths, self.length_ix = np.unique(self.distance(0, np.arange(n)), return_inverse=True)
+        self.fstar = n+np.mod(n, 2)*(2**(1/norm)-1)
+        if par_a > 1 and par_b > 1:
+            # n unit edges, one of them diagonal for odd n -- the optimum computed as tour lengths are
+            counts = np.zeros(len(self.lengths), dtype=int)
+            counts[self.length_ix[1]] += n-np.mod(n, 2)
+            counts[self.length_ix[par_b+1]] += np.mod(n, 2)
+            self.fstar = self.tour_length(counts)
+        self.a = np.zeros(n-1, dtype=int)  # n-1 because the first city is pre-determined
         self.b = np.arange(n-2, 0-1, -1)
+        self.rng = np.random.default_rng(rng)
+
+    def distance(self, i, j):
+        # distances between cities i and j (arrays of city indices), vectorized
+        if self.dist is not None:
+            return self.dist[i, j]
+        dx = np.abs(i // self.par_b - j // self.par_b).astype(float)
+        dy = np.abs(i % self.par_b - j % self.par_b).astype(float)
+        # the same formulas as np.linalg.norm(..., norm) uses for vectors
+        if self.norm == np.inf:
+            return np.maximum(dx, dy)
+        elif self.norm == 1:
+            return dx+dy
+        elif self.norm == 2:
+            return np.sqrt(dx*dx+dy*dy)
+        else:
+            return (dx**self.norm+dy**self.norm)**(1/self.norm)
 
     def generate_point(self):
-        return [np.random.randint(0, i+1) for i in np.arange(self.n-2, 0-1, -1)]
+        return self.rng.integers(0, self.b+1)
 
     def decode(self, x):
         #  decodes solution vector into ordered list of visited cities, e.g:
         #   x = 1 2 2 1 0
         #  cx = 2 4 5 3 1
-        cx = np.zeros(self.n, dtype=np.int)  # the final tour
-        ux = np.ones(self.n, dtype=np.int)  # used cities indices
-        ux[0] = 0  # first city is used automatically
-        c = np.cumsum(ux)  # cities to be included in the tour
-        for k in np.arange(1, self.n):
-            ix = x[k-1]+1  # order index of currently visited city
-            cc = c[ix]  # currently visited city
-            cx[k] = cc # append visited city into final tour
-            c = np.delete(c, ix)  # visited city can not be included in the tour any more
-        return cx
+        #  x[k] is the order index of the visited city among cities not visited yet, the order indices
+        #  are resolved with a Fenwick (binary indexed) tree over cities 1..n-1, i.e. in O(n log n)
+        m = self.n-1  # number of cities to be ordered
+        tree = [i & -i for i in range(m+1)]  # Fenwick tree of a vector of ones (all cities available)
+        top = 1 << (m.bit_length()-1) if m > 0 else 0  # highest power of two <= m
+        cx = [0]*self.n  # the final tour, first city is pre-determined
+        for k in range(1, self.n):
+            # find the (x[k-1]+1)-th available city by descending the tree
+            pos = 0
+            rem = int(x[k-1])+1
+            step = top
+            while step:
+                nxt = pos+step
+                if nxt <= m and tree[nxt] < rem:
+                    pos = nxt
+                    rem -= tree[nxt]
+                step >>= 1
+            cx[k] = pos+1  # append visited city into final tour
+            # visited city can not be included in the tour any more
+            i = pos+1
+            while i <= m:
+                tree[i] -= 1
+                i += i & -i
+        return np.array(cx, dtype=int)
+
+    def decode_batch(self, X):
+        # decodes k solution vectors (rows of X) at once: cities 1..n-1 are split into blocks of about
+        # sqrt(n) cities with per-row counts of available cities, the (x[j]+1)-th available city is found by
+        # a cumulative sum over block counts and another one within the block, i.e. a constant number of
+        # numpy operations on (k, sqrt(n)) arrays per tour position
+        X = np.asarray(X, dtype=int)
+        k = X.shape[0]
+        if k < 32:  # the fixed cost of the numpy operations does not pay off for a few rows
+            return np.array([self.decode(x) for x in X], dtype=int).reshape(k, self.n)
+        m = self.n-1
+        size = max(1, int(np.ceil(np.sqrt(m))))  # block size
+        nblocks = -(-m // size)
+        avail = np.zeros((k, nblocks, size), dtype=bool)  # avail[r, b, i]: city b*size+i+1 not visited yet
+        avail.reshape(k, -1)[:, :m] = True
+        counts = avail.sum(axis=2)
+        rows = np.arange(k)
+        CX = np.zeros((k, self.n), dtype=int)
+        for j in range(1, self.n):
+            rem = X[:, j-1]  # order index among available cities
+            cum = np.cumsum(counts, axis=1)
+            block = np.sum(cum <= rem[:, np.newaxis], axis=1)
+            rem = rem-(cum[rows, block]-counts[rows, block])  # order index within the block
+            i = np.sum(np.cumsum(avail[rows, block], axis=1) <= rem[:, np.newaxis], axis=1)
+            CX[:, j] = block*size+i+1
+            avail[rows, block, i] = False
+            counts[rows, block] -= 1
+        return CX
+
+    def edge_ix(self, i, j):
+        # indices (into self.lengths) of lengths of edges between cities i and j, vectorized
+        b = self.par_b
+        return self.length_ix[np.abs(i // b - j // b)*b+np.abs(i % b - j % b)]
+
+    def tour_counts(self, cx):
+        return np.bincount(self.edge_ix(cx, np.roll(cx, -1)), minlength=len(self.lengths))
+
+    def tour_length(self, counts):
+        # length of tours with counts[..., u] edges of length self.lengths[u] (the same summation for every tour)
+        return np.sum(counts*self.lengths, axis=-1)
 
     def tour_dist(self, cx):
-        d=0
-        for i in np.arange(self.n):
-            dx = self.dist[cx[i-1], cx[i]] if i>0 else self.dist[cx[self.n-1], cx[i]]
-            d += dx
-        return d
+        return self.tour_length(self.tour_counts(cx))
 
     def evaluate(self, x):
         cx = self.decode(x)
         return self.tour_dist(cx)
 
-    def get_neighborhood(self, x, d):
+    def evaluate_batch(self, X):
+        CX = self.decode_batch(X)  # decoded tours, one per row
+        k, u = CX.shape[0], len(self.lengths)
+        ix = self.edge_ix(CX, np.roll(CX, -1, axis=1))+u*np.arange(k)[:, np.newaxis]
+        return self.tour_length(np.bincount(ix.ravel(), minlength=k*u).reshape(k, u))
+
+    def get_state(self, x):
+        x = np.array(x, dtype=int)
+        return self._tour_state(x, self.decode(x))
+
+    def _tour_state(self, x, cx):
+        # Changing digit x[p-1] by -1/+1 swaps the city at tour position p with the city of the next
+        # lower/higher order index among the cities visited after p (the remaining tour is unaffected).
+        # For every position p we store the position of this swap partner (-1 if there is none).
+        n = self.n
+        pos = np.empty(n, dtype=int)  # position of every city in the tour
+        pos[cx] = np.arange(n)
+        lower = np.full(n, -1, dtype=int)
+        higher = np.full(n, -1, dtype=int)
+        later = []  # sorted cities visited after the current position
+        for p in range(n-1, 0, -1):
+            c = cx[p]
+            j = bisect_left(later, c)  # equals x[p-1]
+            if j > 0:
+                lower[p] = pos[later[j-1]]
+            if j < len(later):
+                higher[p] = pos[later[j]]
+            later.insert(j, c)
+        counts = self.tour_counts(cx)
+        return {'x': x, 'cx': cx, 'pos': pos, 'lower': lower, 'higher': higher, 'counts': counts,
+                'f': self.tour_length(counts)}
+
+    def _swap_counts(self, counts, cx, p, q):
+        # edge length counts of the tour after swapping cities at positions p and q
+        n = self.n
+        e = list({(p-1) % n, p, (q-1) % n, q % n})  # edge e connects positions e and e+1
+        e2 = [(i+1) % n for i in e]
+        swap = {p: q, q: p}
+        k = len(e)
+        # the edges before and after the swap, length indices computed at once
+        ix = self.edge_ix(cx[e+[swap.get(i, i) for i in e]], cx[e2+[swap.get(i, i) for i in e2]])
+        u = len(self.lengths)
+        return counts+np.bincount(ix[k:], minlength=u)-np.bincount(ix[:k], minlength=u)
+
+    def get_moves(self, x, d):
         assert d == 1, "TSPGrid supports neighbourhood with distance = 1 only"
-        nd = []
+        return self._moves(x)
+
+    def _moves(self, x):
+        # move (i, s) changes digit x[i] by s
         for i, xi in enumerate(x):
             # x-lower
-            if x[i] > self.a[i]:  # (!) mutation correction .. will be discussed later
-                xl = x.copy()
-                xl[i] = x[i]-1
-                nd.append(xl)
-
+            if xi > self.a[i]:  # (!) mutation correction .. will be discussed later
+                yield (i, -1)
             # x-upper
-            if x[i] < self.b[i]:  # (!) mutation correction ..  -- // --
-                xu = x.copy()
-                xu[i] = x[i]+1
-                nd.append(xu)
+            if xi < self.b[i]:  # (!) mutation correction ..  -- // --
+                yield (i, 1)
+
+    def evaluate_move(self, state, move):
+        i, s = move
+        p = i+1  # tour position decided by digit x[i]
+        q = state['lower'][p] if s < 0 else state['higher'][p]
+        # the same value as evaluate() of the neighbour, bit for bit
+        return self.tour_length(self._swap_counts(state['counts'], state['cx'], p, q))
+
+    @staticmethod
+    def _swapped(cx, p, q):
+        cx = cx.copy()
+        cx[p], cx[q] = cx[q], cx[p]
+        return cx
 
-        return nd
+    def apply_move(self, x, move):
+        i, s = move
+        x = np.array(x, dtype=int)
+        x[i] += s
+        return x
+
+    def update_state(self, state, move):
+        i, s = move
+        p = i+1
+        q = state['lower'][p] if s < 0 else state['higher'][p]
+        return self._tour_state(self.apply_move(state['x'], move), self._swapped(state['cx'], p, q))
+
+    def get_neighborhood(self, x, d):
+        assert d == 1, "TSPGrid supports neighbourhood with distance = 1 only"
+        # neighbours are generated lazily, one copy of x at a time
+        return (self.apply_move(x, move) for move in self.get_moves(x, d))
@@ -0,0 +1,67 @@
+import numpy as np
+from colstore import ColumnWriter, read_columns
+
+
+# On-disk store of experiment results (one row per replicate, see experiment.run_experiment), rows are
+# buffered in chunks and appended to a columnar store (see colstore), analysis reads the columns memory-mapped:
+#
+#   store = ResultStore('fsa_sweep.cols')
+#   run_experiment(FSA, of_factory, param_grid, M=10**6, store=store)
+#   cols = read_results('fsa_sweep.cols')       # {'best_y': memmap, 'best_x': memmap (2-D), 'neval': ...}
+#   tab = pd.DataFrame({name: col for name, col in cols.items() if col.ndim == 1})
+#
+# Numeric scalars and arrays are stored (arrays must have the same shape in all rows), nested dicts such as
+# the 'profile' of report_end() are flattened into columns with dotted names ('profile.counters.evaluations').
+# Other values (None, strings, ...) and step_data are not stored -- use steplog.DiskLog for step data.
+
+SKIPPED = ('step_data',)
+FLOAT_COLUMNS = ('neval',)  # int for successful runs, inf otherwise
+
+
+def flatten_row(row, prefix=''):
+    flat = {}
+    for name, value in row.items():
+        if prefix == '' and name in SKIPPED:
+            continue
+        if isinstance(value, dict):
+            flat.update(flatten_row(value, prefix+name+'.'))
+        elif value is not None:
+            value = np.asarray(value, dtype=float if prefix+name in FLOAT_COLUMNS else None)
+            if value.dtype.kind in 'biuf':
+                flat[prefix+name] = value
+    return flat
+
+
+class ResultStore:
+
+    def __init__(self, path, chunk_size=4096):
+        self.writer = ColumnWriter(path)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.rows = []  # rows not written yet
+
+    def append(self, row):
+        self.rows.append(flatten_row(row))
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        names = list(dict.fromkeys(name for row in self.rows for name in row))
+        columns = {}
+        for name in names:
+            first = next(row[name] for row in self.rows if name in row)
+            missing = np.full_like(first, np.nan if first.dtype.kind == 'f' else 0)
+            columns[name] = np.stack([row.get(name, missing) for row in self.rows])
+        self.writer.append(columns)
+        self.rows = []
+
+    def read(self, names=None):
+        self.flush()
+        return read_results(self.path, names)
+
+
+def read_results(path, names=None):
+    # memory-mapped columns of the store
+    return read_columns(path, names)
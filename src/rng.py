@@ -0,0 +1,32 @@
+import numpy as np
+
+
+class UniformBuffer:
+
+    # Uniform [0, 1) random numbers drawn from a numpy Generator in blocks and handed out one
+    # (or a few) at a time, so that hot loops do not pay the per-call overhead of the Generator.
+
+    def __init__(self, rng, block_size=4096):
+        self.rng = rng
+        self.block_size = block_size
+        self.block = np.empty(0)
+        self.pos = 0
+
+    def refill(self, k):
+        # drops the unused rest of the block and draws a new one (at least k numbers)
+        self.block = self.rng.uniform(low=0.0, high=1.0, size=max(k, self.block_size))
+        self.pos = 0
+
+    def next(self):
+        if self.pos == self.block.size:
+            self.refill(1)
+        u = self.block[self.pos]
+        self.pos += 1
+        return u
+
+    def take(self, k):
+        if self.pos+k > self.block.size:
+            self.refill(k)
+        u = self.block[self.pos:self.pos+k]
+        self.pos += k
+        return u
@@ -0,0 +1,175 @@
+import numpy as np
+from colstore import ColumnWriter, read_columns, fill_value
+
+
+# Step logging of heuristics (see Heuristic.append_log), the log object decides which steps are kept:
+#
+#   StepLog()              -- off, nothing is stored
+#   FullLog(maxeval)       -- every step, rows are indexed by step (up to the last logged step)
+#   EveryKLog(maxeval, k)  -- every k-th step
+#   RingLog(size)          -- the last size steps
+#   DiskLog(path)          -- every step, streamed in chunks to a columnar store on disk (see colstore)
+#
+# Scalar fields are stored in 1-D arrays, vector fields (e.g. x and y) in 2-D arrays with one row per step,
+# columns keep the dtype of logged values. Rows where a field was not logged are NaN in float columns and
+# masked in other ones (data() returns numpy masked arrays for those, on disk they are zeros).
+# In-memory columns grow with the logged steps, they are not preallocated for all rows.
+# Modes other than FullLog add the 'step' column with step numbers of stored rows. Logs may be restricted
+# to some fields, e.g. FullLog(maxeval, fields=('T', 'f_x')).
+
+
+class StepLog:
+
+    def log(self, step, params):
+        pass
+
+    def data(self):
+        return None
+
+
+class ColumnLog(StepLog):
+
+    # in-memory rows of logged fields, a field column is allocated when the field is logged for the first time,
+    # all columns grow together (doubling their capacity) up to nrows rows
+
+    def __init__(self, nrows, fields=None):
+        self.nrows = nrows
+        self.fields = None if fields is None else set(fields)  # logged fields, None for all
+        self.capacity = 0
+        self.columns = {}
+        self.valid = {}  # rows logged in non-float columns
+        self.used = 0  # number of rows written so far (last written row + 1)
+
+    def reserve(self, row):
+        if row < self.capacity:
+            return
+        capacity = min(self.nrows, max(16, row+1, 2*self.capacity))
+        self.columns = {name: grow(col, capacity) for name, col in self.columns.items()}
+        self.valid = {name: grow(valid, capacity) for name, valid in self.valid.items()}
+        self.capacity = capacity
+
+    def column(self, name, value):
+        col = self.columns.get(name)
+        if col is None:
+            value = np.asarray(value)
+            col = np.full((self.capacity,)+value.shape, fill_value(value.dtype), dtype=value.dtype)
+            self.columns[name] = col
+            if value.dtype.kind != 'f':
+                self.valid[name] = np.zeros(self.capacity, dtype=bool)
+        return col
+
+    def row(self, step):
+        # row of the step, None if the step is not stored
+        return step
+
+    def log(self, step, params):
+        row = self.row(step)
+        if row is None:
+            return
+        self.reserve(row)
+        for name, value in params.items():
+            if self.fields is None or name in self.fields:
+                self.column(name, value)[row] = value
+                if name in self.valid:
+                    self.valid[name][row] = True
+        self.used = max(self.used, row+1)
+
+    def set_step(self, row, step):
+        self.reserve(row)
+        self.column('step', step)[row] = step
+        self.valid['step'][row] = True
+
+    def clear(self, row):
+        # forgets the values of the row
+        for name, col in self.columns.items():
+            if name in self.valid:
+                self.valid[name][row] = False
+            else:
+                col[row] = np.nan
+
+    def field(self, name, rows):
+        col = self.columns[name][rows]
+        valid = self.valid.get(name)
+        if valid is None or np.all(valid[rows]):
+            return col
+        mask = np.broadcast_to(~valid[rows].reshape((-1,)+(1,)*(col.ndim-1)), col.shape)
+        return np.ma.masked_array(col, mask=mask)
+
+    def data(self):
+        return {name: self.field(name, slice(0, self.used)) for name in self.columns}
+
+
+class FullLog(ColumnLog):
+
+    def __init__(self, maxeval, fields=None):
+        ColumnLog.__init__(self, maxeval, fields)
+
+
+class EveryKLog(ColumnLog):
+
+    def __init__(self, maxeval, k, fields=None):
+        ColumnLog.__init__(self, (maxeval-1)//k+1, fields)
+        self.k = k
+
+    def row(self, step):
+        if step % self.k != 0:
+            return None
+        row = step // self.k
+        self.set_step(row, step)
+        return row
+
+
+class RingLog(ColumnLog):
+
+    def __init__(self, size, fields=None):
+        ColumnLog.__init__(self, size, fields)
+        self.steps = np.full(size, -1, dtype=int)  # step stored in every row
+
+    def row(self, step):
+        row = step % self.nrows
+        if self.steps[row] != step:  # row is reused, forget the older step
+            if row < self.capacity:
+                self.clear(row)
+            self.steps[row] = step
+            self.set_step(row, step)
+        return row
+
+    def data(self):
+        # rows in chronological order
+        order = np.argsort(self.steps)
+        order = order[self.steps[order] >= 0]
+        return {name: self.field(name, order) for name in self.columns}
+
+
+def grow(col, capacity):
+    new = np.full((capacity,)+col.shape[1:], fill_value(col.dtype), dtype=col.dtype)
+    new[:len(col)] = col
+    return new
+
+
+class DiskLog(StepLog):
+
+    def __init__(self, path, chunk_size=65536, fields=None):
+        self.writer = ColumnWriter(path)
+        self.chunk_size = chunk_size
+        self.chunk = ColumnLog(chunk_size, fields)  # rows of steps chunk_start, chunk_start+1, ...
+        self.chunk_start = None  # the next logged step starts a new chunk
+
+    def log(self, step, params):
+        if self.chunk_start is None or step >= self.chunk_start+self.chunk_size:
+            self.flush()
+            self.chunk_start = step
+        row = step-self.chunk_start
+        self.chunk.set_step(row, step)
+        self.chunk.log(row, params)
+
+    def flush(self):
+        used = self.chunk.used
+        self.writer.append({name: col[:used] for name, col in self.chunk.columns.items()})
+        self.chunk = ColumnLog(self.chunk_size, self.chunk.fields)
+        self.chunk_start = None
+
+    def data(self):
+        # memory-mapped columns of the whole log
+        self.flush()
+        return read_columns(self.writer.path)
@@ -0,0 +1,173 @@
+import numpy as np
+from statistics import NormalDist
+from aggregate import NevalStats
+from experiment import run_replicates
+
+
+# Parameter tuning of heuristics by the feoktistov criterion (feo, see aggregate), built on the experiment
+# runner (see experiment.run_replicates).
+#
+# Racing: configurations are run in rounds, after each round the configurations whose feo is significantly
+# worse than that of the best one are eliminated and the replicates of the next round are split among the
+# survivors only:
+#
+#   res = race(FSA, functools.partial(AirShip, -100, 0, 800),
+#              param_configs({'maxeval': [1000], 'T0': [0, 1, 10, np.inf], 'n0': [100], 'alpha': [2], 'r': [0.5]}),
+#              round_size=100, max_rounds=10)
+#   pd.DataFrame(res)  # feo (with confidence interval), number of replicates and elimination round per configuration
+#
+# Successive halving with a surrogate model for continuous and integer parameters: brackets of configurations
+# are evaluated with a growing budget (replicates and optionally maxeval), only the best 1/eta of them advance
+# to the next rung. Configurations of the first bracket are random, the following brackets are partly
+# proposed by a quadratic regression of log(feo) fitted locally around the best configuration found so far:
+#
+#   space = {'T0': (1e-3, 1e2, 'log'), 'n0': (10, 1000, 'int'), 'alpha': (0.5, 4, 'float'), 'r': (0.1, 10, 'log')}
+#   best, rows = halving_search(FSA, functools.partial(AirShip, -100, 0, 800), space, {'maxeval': 1000})
+
+
+def feo_bounds(stats, z):
+    # confidence interval of feo, a configuration without successful runs is taken as infinitely bad,
+    # one with too few successful runs for an interval (e.g. a single one) as undecided
+    if stats.k == 0:
+        return np.inf, np.inf
+    lo, hi = stats.feo_ci(z)
+    if np.isnan(lo) or np.isnan(hi):
+        return 0.0, np.inf
+    return lo, hi
+
+
+def race(heur_class, of_factory, configs, round_size=100, max_rounds=10, confidence=0.95, seed=0, workers=None):
+    # every round runs round_size replicates per configuration of configs (list of parameter dicts), divided
+    # equally among the surviving configurations; a configuration is eliminated when the lower bound of its feo
+    # confidence interval is above the upper bound of the best one, the race ends after max_rounds rounds or
+    # with a single survivor
+    z = NormalDist().inv_cdf((1+confidence)/2)
+    stats = [NevalStats() for params in configs]
+    eliminated = [None]*len(configs)  # round of elimination
+    alive = list(range(len(configs)))
+    for rnd in range(max_rounds):
+        per_config = round_size*len(configs) // len(alive)
+        jobs = [(c, configs[c], stats[c].n+i) for c in alive for i in range(per_config)]
+        nevals = {c: [] for c in alive}
+        for (c, params, replicate), row in zip(jobs, run_replicates(heur_class, of_factory, jobs, seed, workers)):
+            nevals[c].append(row['neval'])
+        for c in alive:
+            stats[c].add_batch(nevals[c])
+
+        bounds = {c: feo_bounds(stats[c], z) for c in alive}
+        best_hi = min(hi for lo, hi in bounds.values())
+        if best_hi < np.inf:
+            for c in list(alive):
+                if bounds[c][0] > best_hi:
+                    alive.remove(c)
+                    eliminated[c] = rnd
+        if len(alive) == 1:
+            break
+
+    return [dict(configs[c], replicates=stats[c].n, eliminated=eliminated[c], **stats[c].summary(confidence))
+            for c in range(len(configs))]
+
+
+def decode(space, u):
+    # parameters of a point u of the unit cube, space maps names to (low, high, kind), kind is 'float',
+    # 'log' (float, uniform on the log scale) or 'int'
+    params = {}
+    for (name, (low, high, kind)), ui in zip(space.items(), u):
+        if kind == 'log':
+            params[name] = float(np.exp(np.log(low)+ui*(np.log(high)-np.log(low))))
+        elif kind == 'int':
+            params[name] = int(min(np.floor(low+ui*(high-low+1)), high))
+        else:
+            params[name] = float(low+ui*(high-low))
+    return params
+
+
+def quadratic_features(U):
+    # 1, u_i and u_i*u_j (i <= j) for every row of U
+    i, j = np.triu_indices(U.shape[1])
+    return np.hstack([np.ones((len(U), 1)), U, U[:, i]*U[:, j]])
+
+
+class LocalQuadratic:
+
+    # quadratic ridge regression weighted by a Gaussian kernel around the center point
+
+    def __init__(self, U, y, center, width=0.3, ridge=1e-3):
+        X = quadratic_features(U)
+        w = np.exp(-np.sum((U-center)**2, axis=1)/(2*width**2))
+        A = X.T @ (w[:, np.newaxis]*X)+ridge*np.eye(X.shape[1])
+        self.beta = np.linalg.solve(A, X.T @ (w*y))
+
+    def predict(self, U):
+        return quadratic_features(U) @ self.beta
+
+
+def propose(U, y, size, d, rng, random_fraction=1/3, n_candidates=1000, spread=0.15):
+    # size new points of the d-dimensional unit cube, random ones and those with the best surrogate prediction
+    # among candidates drawn around the best observed point (all random while there are too few observations)
+    if U is None or len(U) < quadratic_features(U[:1]).shape[1]:
+        return rng.random((size, d))
+    n_random = int(np.ceil(size*random_fraction))
+    center = U[np.argmin(y)]
+    model = LocalQuadratic(U, y, center)
+    candidates = np.clip(center+spread*rng.standard_normal((n_candidates, d)), 0, 1)
+    best = candidates[np.argsort(model.predict(candidates))[:size-n_random]]
+    return np.vstack([best, rng.random((n_random, d))])
+
+
+def log_feo(stats_list):
+    # regression targets, configurations without successful runs are penalized
+    y = np.array([np.log(stats.feo()) if stats.k > 0 else np.nan for stats in stats_list])
+    worst = np.nanmax(y) if np.any(np.isfinite(y)) else 0.0
+    return np.where(np.isfinite(y), y, worst+1)
+
+
+def halving_search(heur_class, of_factory, space, fixed, n_brackets=4, n_configs=27, eta=3, min_replicates=10,
+                   scale_maxeval=False, seed=0, workers=None):
+    # fixed holds the remaining parameters of heur_class (including maxeval); with scale_maxeval the rung r
+    # runs with maxeval//eta**(last rung-r), otherwise only the number of replicates grows (min_replicates*eta**r);
+    # returns the parameters of the configuration with the best feo in the highest rung and one row per
+    # evaluated configuration and rung
+    rng = np.random.default_rng(seed)
+    n_rungs = int(np.floor(np.log(n_configs)/np.log(eta)+1e-9))+1
+    rows = []
+    top = []  # (params, stats) of configurations in the highest rung
+    observed = [[] for rung in range(n_rungs)]  # (u, log feo) of configurations evaluated in every rung
+    config_ix = 0  # configurations of all brackets are numbered for replicate seeds
+    for bracket in range(n_brackets):
+        # the surrogate is fitted in the highest rung with enough observations
+        nfeat = quadratic_features(np.zeros((1, len(space)))).shape[1]
+        obs = next((o for o in reversed(observed) if len(o) >= nfeat), None)
+        if obs is None:
+            U = propose(None, None, n_configs, len(space), rng)
+        else:
+            U = propose(np.array([u for u, y in obs]), np.array([y for u, y in obs]), n_configs, len(space), rng)
+        ixs = np.arange(config_ix, config_ix+n_configs)
+        config_ix += n_configs
+        stats = [NevalStats() for u in U]
+        for rung in range(n_rungs):
+            params = [dict(fixed, **decode(space, u)) for u in U]
+            if scale_maxeval:
+                for p in params:
+                    p['maxeval'] = max(1, fixed['maxeval']//eta**(n_rungs-1-rung))
+                stats = [NevalStats() for u in U]  # results with other maxeval are not comparable
+            replicates = min_replicates*eta**rung
+            jobs = [(ix, p, r) for ix, p, st in zip(ixs, params, stats) for r in range(st.n, replicates)]
+            nevals = {ix: [] for ix in ixs}
+            for (ix, p, r), row in zip(jobs, run_replicates(heur_class, of_factory, jobs, seed, workers)):
+                nevals[ix].append(row['neval'])
+            for ix, st in zip(ixs, stats):
+                st.add_batch(nevals[ix])
+            for p, st in zip(params, stats):
+                rows.append(dict(p, bracket=bracket, rung=rung, replicates=st.n, **st.summary()))
+
+            y = log_feo(stats)
+            observed[rung].extend(zip(U, y))
+            if rung == n_rungs-1:
+                top.extend(zip(params, stats))
+            if rung < n_rungs-1:
+                keep = np.sort(np.argsort(y, kind='stable')[:max(1, len(U)//eta)])
+                U, ixs, stats = U[keep], ixs[keep], [stats[c] for c in keep]
+
+    best_params, best_stats = min(top, key=lambda ps: ps[1].feo() if ps[1].k > 0 else np.inf)
+    return dict(best_params), rows